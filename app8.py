@@ -1,16 +1,34 @@
+import time
+_inicio_script = time.perf_counter()
+
 import streamlit as st
-import pandas as pd
-import matplotlib.pyplot as plt
 import base64
-import graphviz  
+import os
+import tempfile
+import uuid
+from datetime import date, timedelta
+from pathlib import Path
+
+# Solo se importa al inicio la base de reglas; pandas, matplotlib y graphviz se cargan
+# dentro de la vista que los usa (los módulos quedan en caché para todo el proceso)
+from parametros import PARAMETROS, MECANISMOS, MOTOR
+from rendimiento import METRICAS, estadisticas, medir
 
 st.set_page_config(page_title="Análisis de Mecanismos de Falla", layout="wide")
 
+# Métricas de rendimiento de esta sesión (etapa -> últimas duraciones en ms)
+with medir("sesion.inicializar"):
+    if "metricas" not in st.session_state:
+        st.session_state["metricas"] = {}
+        st.session_state["id_sesion"] = uuid.uuid4().hex[:8]
+
 # ==========================================================================================
 # FUNCIONES UTILITARIAS
 # ==========================================================================================
 
+@st.cache_resource
 def get_base64(img_path):
+    # Se lee y codifica una sola vez por proceso y se comparte entre sesiones
     try:
         with open(img_path, "rb") as f:
             data = f.read()
@@ -18,82 +36,49 @@ def get_base64(img_path):
     except FileNotFoundError:
         return "" # Retorna vacío si no encuentra la imagen para que no falle
 
-# Cargar logo (Asegúrate de tener la imagen o el código no mostrará el logo)
-img_logo = get_base64("evo.png")
+@st.cache_resource
+def obtener_historial():
+    # Una sola instancia por proceso; cada consulta abre su propia conexión SQLite
+    from historial import Historial
+    return Historial()
+
+@st.cache_resource
+def tablas_mecanismos(version_reglas):
+    # Tablas de la vista "Tabla / Visual", construidas una vez por versión de la base de reglas
+    import pandas as pd
+
+    return {
+        m: pd.DataFrame([
+            {
+                "Driver": f"{m}-D{i}",
+                "Parámetro": PARAMETROS[p]["nombre"],
+                "Tipo": MOTOR.tipo_texto(p),
+                "Criterio": MOTOR.criterio_texto(p),
+                "Observaciones": PARAMETROS[p]["obs"],
+            }
+            for i, p in enumerate(MOTOR.por_mecanismo[m], start=1)
+        ])
+        for m in MECANISMOS
+    }
 
-# ==========================================================================================
-# BASE COMPLETA DE PARÁMETROS
-# ==========================================================================================
+@st.cache_resource
+def obtener_monitor():
+    # Un solo monitor por proceso: su hilo con el event loop sigue leyendo entre reruns y sesiones
+    from streaming import MonitorStreaming
+    return MonitorStreaming()
+
+def cronometro(etapa):
+    # Mide una etapa y la registra en las métricas de la sesión y en las del proceso
+    return medir(etapa, st.session_state["metricas"], st.session_state["id_sesion"])
 
-PARAMETROS = {
-    "agua_libre": {"mecanismo": "M1", "tipo": "num", "critico": lambda v: v >= 2, "critico_severo": None,
-                   "obs": "Agua en contacto con acero activa corrosión general."},
-    "ph": {"mecanismo": "M1", "tipo": "num", "critico": lambda v: v <= 6, "critico_severo": None,
-           "obs": "Acidez favorece corrosión."},
-    "pco2": {"mecanismo": "M1", "tipo": "num", "critico": lambda v: v >= 0.3, "critico_severo": lambda v: v >= 1,
-             "obs": "Corrosión dulce."},
-    "oxigeno_disuelto": {"mecanismo": "M1", "tipo": "num", "critico": lambda v: v > 50, "critico_severo": None,
-                         "obs": "Muy corrosivo en sistemas 'deaerated'."},
-    "temperatura_m1": {"mecanismo": "M1", "tipo": "num", "critico": lambda v: v >= 40, "critico_severo": None,
-                       "obs": "Aumenta la tasa de corrosión."},
-    "corrosion_rate": {"mecanismo": "M1", "tipo": "num", "critico": lambda v: v >= 0.10,
-                       "critico_severo": lambda v: v >= 0.30, "obs": "Usa cupones/UT."},
-
-    "deadlegs": {"mecanismo": "M2", "tipo": "bool", "critico": lambda v: v is True, "critico_severo": None,
-                 "obs": "Zonas sin barrido hidráulico."},
-    "interfaz_liquido_gas": {"mecanismo": "M2", "tipo": "bool", "critico": lambda v: v is True,
-                             "critico_severo": None, "obs": "Potencia pitting interno."},
-    "cloruros": {"mecanismo": "M2", "tipo": "num", "critico": lambda v: v >= 50, "critico_severo": None,
-                 "obs": "Pitting en inox o CS recubierto."},
-    "velocidad_baja": {"mecanismo": "M2", "tipo": "num", "critico": lambda v: v <= 0.3, "critico_severo": None,
-                       "obs": "Permite acumulación."},
-    "severidad_pit": {"mecanismo": "M2", "tipo": "num", "critico": lambda v: v <= 80, "critico_severo": None,
-                      "obs": "Identifica pitting significativo."},
-
-    "velocidad_liq_sol_m3": {"mecanismo": "M3", "tipo": "num", "critico": lambda v: v >= 3, "critico_severo": None,
-                             "obs": "Líquidos con sólidos ≥3 m/s; gas ≥15 m/s."},
-    "velocidad_m3_gas": {"mecanismo": "M3", "tipo": "num", "critico": lambda v: v >= 15, "critico_severo": None,
-                         "obs": "Líquidos con sólidos ≥3 m/s; gas ≥15 m/s."},
-    "solidos": {"mecanismo": "M3", "tipo": "num", "critico": lambda v: v >= 0.5, "critico_severo": None,
-                "obs": "O concentración ≥ 50–100 mg/L."},
-    "geometria_agresiva": {"mecanismo": "M3", "tipo": "bool", "critico": lambda v: v is True, "critico_severo": None,
-                           "obs": "Codo/tee/restricción."},
-    "patron_visual": {"mecanismo": "M3", "tipo": "bool", "critico": lambda v: v is True, "critico_severo": None,
-                      "obs": "Perfil erosivo confirmado."},
-
-    "aislamiento": {"mecanismo": "M4", "tipo": "bool", "critico": lambda v: v is True, "critico_severo": None,
-                    "obs": "Requisito de CUI."},
-    "rango_temp_cui": {"mecanismo": "M4", "tipo": "num", "critico": lambda v: v >= 40, "critico_severo": None,
-                       "obs": "Según API 583."},
-    "dano_jacket": {"mecanismo": "M4", "tipo": "bool", "critico": lambda v: v is True, "critico_severo": None,
-                    "obs": "Ingreso de agua."},
-    "ambiente_humedo": {"mecanismo": "M4", "tipo": "bool", "critico": lambda v: v is True, "critico_severo": None,
-                        "obs": "Lluvia, lavado, ambientes húmedos."},
-    "soportes_humedad": {"mecanismo": "M4", "tipo": "bool", "critico": lambda v: v is True, "critico_severo": None,
-                         "obs": "Evidencia visual."},
-
-    "depositos_internos": {"mecanismo": "M5", "tipo": "num", "critico": lambda v: v >= 1, "critico_severo": None,
-                           "obs": "Incrustación visible."},
-    "velocidad_baja_m5": {"mecanismo": "M5", "tipo": "num", "critico": lambda v: v <= 0.3, "critico_severo": None,
-                          "obs": "Bajo barrido hidráulico."},
-    "microbiologia": {"mecanismo": "M5", "tipo": "num", "critico": lambda v: v >= 1000, "critico_severo": None,
-                      "obs": "SRB u otros microorganismos."},
-    "fluidos_nutrientes": {"mecanismo": "M5", "tipo": "bool", "critico": lambda v: v is True, "critico_severo": None,
-                           "obs": "Agua sucia o hidrocarburos pesados."},
-    "pitting_bajo_depositos": {"mecanismo": "M5", "tipo": "bool", "critico": lambda v: v is True, "critico_severo": None,
-                               "obs": "Confirmación visual."},
-
-    "t_externa": {"mecanismo": "M12", "tipo": "num", "critico": lambda v: v < 0, "critico_severo": None,
-                  "obs": "Temperatura externa bajo freezing."},
-    "operacion_detenida": {"mecanismo": "M12", "tipo": "bool", "critico": lambda v: v is True, "critico_severo": None,
-                           "obs": "Línea sin flujo."},
-    "sin_purgas": {"mecanismo": "M12", "tipo": "bool", "critico": lambda v: v is True, "critico_severo": None,
-                   "obs": "Agua atrapada."},
-    "sin_tracing": {"mecanismo": "M12", "tipo": "bool", "critico": lambda v: v is True, "critico_severo": None,
-                    "obs": "Riesgo de congelamiento."},
-    "patron_rotura": {"mecanismo": "M12", "tipo": "bool", "critico": lambda v: v is True, "critico_severo": None,
-                      "obs": "Grieta circunferencial típica."},
-}
+@st.cache_resource
+def registro_arranque():
+    # Compartido por todas las sesiones: guarda la duración de la primera ejecución del proceso
+    return {}
+
+# Cargar logo (Asegúrate de tener la imagen o el código no mostrará el logo)
+with cronometro("activos.logo"):
+    img_logo = get_base64("evo.png")
 
 # ==========================================================================================
 # SIDEBAR
@@ -110,7 +95,9 @@ with st.sidebar:
             unsafe_allow_html=True
         )
     st.title("⚙️ Panel") 
-    vista = st.radio("Selecciona vista", ["Calculadora", "Tabla / Visual", "Mapa Conceptual", "Árbol de Fallas (Master)"])
+    vista = st.radio("Selecciona vista", ["Calculadora", "Evaluación por Lote", "Historial", "Monitoreo en Línea", "Sensibilidad", "Tabla / Visual", "Mapa Conceptual", "Árbol de Fallas (Master)"], key="vista")
+    marcador_tiempo = st.empty()
+    panel_rendimiento = st.container()
 
 
 # ==========================================================================================
@@ -120,6 +107,8 @@ if vista == "Calculadora":
     st.title("📊 Plataforma Inteligente de Análisis de Causa Raíz - Falla en sistemas de Tuberías")
     st.write("Selecciona los parámetros que deseas ingresar.")
 
+    activo = st.text_input("Activo / línea evaluada", value="caso-manual")
+
     parametros_seleccionados = st.multiselect(
         "Selecciona parámetros a evaluar",
         list(PARAMETROS.keys())
@@ -138,54 +127,46 @@ if vista == "Calculadora":
             valores[p] = st.radio(f"Seleccione valor para {p}", [False, True])
 
     if st.button("Calcular"):
-        # ---------------------------------------------------------
-        # GUARDAR EN SESSION_STATE (Corrección clave)
-        # ---------------------------------------------------------
-        st.session_state["valores"] = valores
-        
-        st.header("📌 Resultados")
+        import pandas as pd
+        from evaluacion import COLUMNA_ACTIVO, evaluar_valores
+        from graficos import graficos_caso
+        from resultados import ResultadoLote
 
-        activados = {m: 0 for m in ["M1", "M2", "M3", "M4", "M5", "M12"]}
-        severidad = {m: 0 for m in activados}
-        drivers_activados = {m: [] for m in activados}
+        st.header("📌 Resultados")
 
         # Evaluación
-        for p, v in valores.items():
-            info = PARAMETROS[p]
-            mec = info["mecanismo"]
-
-            if info["critico"](v):
-                activados[mec] += 1
-                severidad[mec] = max(severidad[mec], 1)
-                drivers_activados[mec].append(p)
-
-            if info["critico_severo"] and info["critico_severo"](v):
-                activados[mec] += 1
-                severidad[mec] = max(severidad[mec], 2)
-                if p not in drivers_activados[mec]:
-                    drivers_activados[mec].append(p)
-
-        # Gráficos
+        with cronometro("calculadora.evaluacion"):
+            activados, severidad, drivers_activados = evaluar_valores(valores)
+            caso = ResultadoLote.desde_caso(valores, activados, severidad, drivers_activados, activo=activo)
+
+        # ---------------------------------------------------------
+        # GUARDAR EN SESSION_STATE (Corrección clave)
+        # ---------------------------------------------------------
+        # Se guarda el resultado compacto (entradas y resultados en arreglos), no los dicts
+        with cronometro("sesion.guardar_caso"):
+            st.session_state["caso"] = caso
+
+        # Registrar la corrida en el historial persistente
+        if valores:
+            with cronometro("calculadora.historial"):
+                obtener_historial().registrar_corrida(
+                    pd.DataFrame([{COLUMNA_ACTIVO: activo, **valores}]),
+                    caso.a_dataframe(),
+                    origen="calculadora",
+                )
+
+        # Gráficos (renderizados una vez por combinación de resultados y reutilizados)
         st.subheader("📉 Visualización Gráfica")
-        df = pd.DataFrame({
-            "Mecanismo": activados.keys(),
-            "Parámetros Activados": activados.values(),
-            "Severidad": severidad.values()
-        })
+        with cronometro("calculadora.graficos"):
+            png_activados, png_severidad = graficos_caso(activados, severidad)
 
-        col1, col2 = st.columns(2)
-        with col1:
-            fig1, ax1 = plt.subplots()
-            ax1.bar(df["Mecanismo"], df["Parámetros Activados"], color='skyblue')
-            ax1.set_title("Parámetros Activados")
-            st.pyplot(fig1)
+        with cronometro("calculadora.render_graficos"):
+            col1, col2 = st.columns(2)
+            with col1:
+                st.image(png_activados, width="stretch")
 
-        with col2:
-            fig2, ax2 = plt.subplots()
-            colores_sev = ['green' if s == 0 else 'orange' if s == 1 else 'red' for s in df["Severidad"]]
-            ax2.bar(df["Mecanismo"], df["Severidad"], color=colores_sev)
-            ax2.set_title("Nivel de Severidad")
-            st.pyplot(fig2)
+            with col2:
+                st.image(png_severidad, width="stretch")
 
         # Recomendaciones
         st.subheader("📘 Estado General")
@@ -198,85 +179,380 @@ if vista == "Calculadora":
             elif sev == 2:
                 st.error(f"🔥 **{m}: Severo** — Drivers: {drivers}")
 
+        # Cercanía a los umbrales: distingue un valor al borde del límite de uno holgado
+        from reglas import NIVELES
+        from sensibilidad import ranking_margenes
+
+        with cronometro("calculadora.margenes"):
+            margenes = ranking_margenes(pd.DataFrame([valores]), k=5, por_segmento=False)
+        if not margenes.empty:
+            st.subheader("📏 Parámetros más cercanos al siguiente umbral")
+            margenes["nivel_siguiente"] = margenes["nivel_siguiente"].map(NIVELES)
+            margenes["margen_relativo"] *= 100
+            st.dataframe(
+                margenes.drop(columns=[COLUMNA_ACTIVO]),
+                hide_index=True,
+                column_config={"margen_relativo": st.column_config.NumberColumn("margen relativo (%)", format="%.1f")},
+            )
+
+        # Reporte PDF del caso (en lugar de capturas de pantalla)
+        from reportes import reporte_pdf
+
+        with cronometro("calculadora.reporte"):
+            pdf = reporte_pdf(activo, valores, activados, severidad, drivers_activados)
+        st.download_button("📄 Descargar reporte PDF", pdf, file_name=f"reporte_{activo}.pdf", mime="application/pdf")
+
+# ==========================================================================================
+# VISTA: EVALUACIÓN POR LOTE (INVENTARIO COMPLETO)
+# ==========================================================================================
+elif vista == "Evaluación por Lote":
+    from evaluacion import COLUMNA_ACTIVO, evaluar_lote_compacto, leer_inventario
+    from graficos import resumen_severidad
+
+    st.title("🗂️ Evaluación por Lote del Inventario de Tuberías")
+    st.write("Sube un inventario con una fila por segmento y una columna por parámetro "
+             "(opcionalmente una columna `activo` con el identificador del segmento).")
+
+    archivo = st.file_uploader("Inventario (CSV o Parquet)", type=["csv", "parquet"])
+
+    if archivo is not None:
+        with cronometro("lote.lectura"):
+            inventario = leer_inventario(archivo)
+        desconocidas = [c for c in inventario.columns if c not in PARAMETROS and c != COLUMNA_ACTIVO]
+        if desconocidas:
+            st.caption(f"Columnas ignoradas (no son parámetros): {', '.join(desconocidas)}")
+
+        with cronometro("lote.evaluacion"):
+            compactos = evaluar_lote_compacto(inventario)
+        with cronometro("sesion.guardar_lote"):
+            st.session_state["lote"] = {"nombre": archivo.name, "inventario": inventario, "resultados": compactos}
+
+        # Tabla con los drivers en texto para mostrar, descargar y guardar
+        with cronometro("lote.conversion"):
+            resultados = compactos.a_dataframe()
+
+        st.header("📌 Resultados")
+        with cronometro("lote.render_tabla"):
+            st.dataframe(resultados, width="stretch")
+
+        # Resumen por mecanismo
+        st.subheader("📘 Segmentos por Nivel de Severidad")
+        with cronometro("lote.graficos"):
+            resumen = resumen_severidad(resultados)
+        with cronometro("lote.render_graficos"):
+            st.bar_chart(resumen, color=["#2ecc71", "#f39c12", "#e74c3c"], sort=False)
+            st.table(resumen)
+
+        st.download_button(
+            "Descargar resultados (CSV)",
+            resultados.to_csv(index=False).encode("utf-8"),
+            file_name="resultados_mecanismos.csv",
+            mime="text/csv",
+        )
+
+        if st.button("Guardar en historial"):
+            with cronometro("lote.historial"):
+                corrida_id = obtener_historial().registrar_corrida(inventario, resultados, origen=f"lote:{archivo.name}")
+            st.success(f"Corrida #{corrida_id} guardada ({len(resultados)} segmentos).")
+
+        # Reportes PDF por segmento, generados en paralelo y entregados en un ZIP
+        st.subheader("📄 Reportes por Segmento")
+        # El ZIP queda en un archivo temporal (uno por sesión): en la sesión solo se guarda la ruta
+        reportes = st.session_state.get("reportes_lote")
+        if reportes is not None and (reportes["archivo"] != archivo.file_id or not os.path.exists(reportes["ruta"])):
+            if os.path.exists(reportes["ruta"]):
+                os.remove(reportes["ruta"])
+            reportes = st.session_state["reportes_lote"] = None
+        if reportes is None:
+            if st.button(f"Generar reportes PDF ({len(resultados)} segmentos)"):
+                from reportes import reportes_zip
+
+                descriptor, ruta_zip = tempfile.mkstemp(prefix="simef_reportes_", suffix=".zip")
+                os.close(descriptor)
+                avance = st.progress(0.0, text="Generando reportes…")
+                with cronometro("lote.reportes"):
+                    reportes_zip(
+                        inventario, resultados, ruta_zip,
+                        al_avanzar=lambda hechos, total: avance.progress(hechos / total, text=f"{hechos}/{total} reportes"),
+                    )
+                avance.empty()
+                reportes = st.session_state["reportes_lote"] = {"archivo": archivo.file_id, "ruta": ruta_zip}
+        if reportes is not None:
+            st.download_button(
+                "Descargar reportes (ZIP)",
+                # Se lee del disco recién al hacer clic
+                Path(reportes["ruta"]).read_bytes,
+                file_name=f"reportes_{archivo.name.rsplit('.', 1)[0]}.zip",
+                mime="application/zip",
+            )
+
+# ==========================================================================================
+# VISTA: HISTORIAL DE EVALUACIONES
+# ==========================================================================================
+elif vista == "Historial":
+    st.title("🕓 Historial de Evaluaciones")
+
+    historial = obtener_historial()
+
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        mecanismo = st.selectbox("Mecanismo", ["Todos"] + MECANISMOS)
+        severidad_min = st.selectbox("Severidad mínima", [0, 1, 2],
+                                     format_func=lambda n: ["Normal", "Alerta", "Severo"][n])
+    with col2:
+        activo = st.text_input("Activo (vacío = todos)")
+        hoy = date.today()
+        rango = st.date_input("Periodo", value=(hoy - timedelta(days=90), hoy))
+    with col3:
+        limite = st.number_input("Máximo de filas", min_value=100, value=10_000, step=1000)
+
+    # Con el rango borrado `date_input` devuelve (): se consulta sin filtro de fechas
+    desde, hasta = (rango if len(rango) == 2 else (rango[0], rango[0]) if rango else (None, None))
+    with cronometro("historial.consulta"):
+        encontrados = historial.consultar(
+            mecanismo=None if mecanismo == "Todos" else mecanismo,
+            severidad_min=severidad_min or None,
+            activo=activo or None,
+            desde=desde,
+            hasta=None if hasta is None else hasta + timedelta(days=1),
+            limite=limite,
+        )
+
+    st.subheader(f"📌 {len(encontrados)} resultados")
+    st.dataframe(encontrados, width="stretch")
+
+    with st.expander("Corridas registradas"):
+        st.dataframe(historial.corridas(), width="stretch")
+
+# ==========================================================================================
+# VISTA: MONITOREO EN LÍNEA
+# ==========================================================================================
+elif vista == "Monitoreo en Línea":
+    from evaluacion import COLUMNA_ACTIVO
+    from reglas import NIVELES
+
+    st.title("📡 Monitoreo en Línea de Sensores")
+    st.write(
+        "Lee lecturas de instrumentación desde un archivo CSV/JSONL que se va escribiendo o desde un socket local. "
+        "Cada activo conserva una ventana de las últimas lecturas por parámetro y solo se reevalúan "
+        "los mecanismos cuyos parámetros recibieron datos."
+    )
+
+    monitor = obtener_monitor()
+
+    col1, col2 = st.columns(2)
+    with col1:
+        fuente = st.radio("Fuente", ["Archivo (CSV/JSONL)", "Socket local"], horizontal=True)
+        if fuente == "Archivo (CSV/JSONL)":
+            ruta = st.text_input("Ruta del archivo", value="lecturas.jsonl")
+            desde_inicio = st.checkbox("Leer desde el inicio del archivo", value=True)
+        else:
+            puerto = st.number_input("Puerto", min_value=1024, max_value=65535, value=8765)
+    with col2:
+        tamano_ventana = st.number_input("Lecturas por ventana", min_value=1, max_value=1000, value=monitor.tamano_ventana)
+        refresco = st.select_slider("Refresco (s)", [0.5, 1.0, 2.0, 5.0], value=1.0)
+
+    b1, b2, b3 = st.columns(3)
+    if b1.button("▶️ Iniciar"):
+        monitor.tamano_ventana = int(tamano_ventana)
+        if fuente == "Archivo (CSV/JSONL)":
+            monitor.iniciar_archivo(ruta, desde_inicio)
+        else:
+            monitor.iniciar_socket(int(puerto))
+    if b2.button("⏹️ Detener"):
+        monitor.detener()
+    if b3.button("🧹 Limpiar estado"):
+        monitor.reiniciar()
+
+    # Solo este fragmento se vuelve a ejecutar en cada refresco, no el script completo
+    @st.fragment(run_every=refresco if monitor.activo else None)
+    def panel_monitoreo():
+        estado = monitor.estadisticas()
+        latencia = METRICAS.resumen().get("streaming.evaluacion")
+
+        if monitor.error:
+            st.error(f"La fuente se detuvo: {monitor.error}")
+        elif monitor.activo:
+            st.caption(f"🟢 Leyendo de {monitor.origen}")
+        else:
+            st.caption("⚪ Monitor detenido")
+
+        m1, m2, m3, m4 = st.columns(4)
+        m1.metric("Activos", f"{estado['activos']:,}")
+        m2.metric("Lecturas", f"{estado['lecturas']:,}", f"{estado['lecturas_s']:,.0f}/s", delta_color="off")
+        m3.metric("Mecanismos reevaluados", f"{estado['evaluaciones']:,}")
+        m4.metric("Evaluación p95", f"{latencia['p95_ms']:.1f} ms" if latencia else "—")
+
+        severidad_min = st.selectbox("Severidad mínima", list(NIVELES), format_func=NIVELES.get, key="monitoreo_severidad")
+        with cronometro("monitoreo.tabla"):
+            tabla = monitor.tabla(severidad_min=severidad_min)
+            columnas = [COLUMNA_ACTIVO, "severidad_max", "actualizado"] + [f"{m}_severidad" for m in MECANISMOS]
+            st.dataframe(tabla[columnas], hide_index=True, width="stretch")
+
+    panel_monitoreo()
+
+
+# ==========================================================================================
+# VISTA: SENSIBILIDAD Y MARGEN A UMBRALES
+# ==========================================================================================
+elif vista == "Sensibilidad":
+    import numpy as np
+    import pandas as pd
+    from evaluacion import COLUMNA_ACTIVO
+    from graficos import mapa_calor_barrido
+    from reglas import NIVELES
+    from sensibilidad import proporcion_niveles, ranking_margenes, rejilla_sugerida
+
+    st.title("🎚️ Sensibilidad y Margen a Umbrales")
+
+    lote = st.session_state.get("lote")
+    caso = st.session_state.get("caso")
+    valores_caso = caso.caso(0).valores if caso is not None else {}
+    origenes = []
+    if lote is not None:
+        origenes.append("Inventario por lote")
+    if valores_caso:
+        origenes.append("Caso de la Calculadora")
+    if not origenes:
+        st.warning("⚠️ Primero sube un inventario en *Evaluación por Lote* o calcula un caso en la *Calculadora*.")
+        st.stop()
+
+    origen = st.radio("Segmentos", origenes, horizontal=True)
+    if origen == "Inventario por lote":
+        inventario = lote["inventario"]
+    else:
+        inventario = pd.DataFrame([{COLUMNA_ACTIVO: "Calculadora", **valores_caso}])
+    st.caption(f"{len(inventario):,} segmentos")
+
+    tab_barrido, tab_margen = st.tabs(["Barrido de parámetros", "Margen a umbrales"])
+
+    with tab_barrido:
+        numericos = [p for p, info in PARAMETROS.items() if info["tipo"] == "num"]
+        barridos = st.multiselect("Parámetros a barrer (uno o dos)", numericos, max_selections=2)
+        if barridos:
+            puntos = st.slider("Puntos por parámetro", 10, 200, 50)
+            rejillas = {}
+            for columna, p in zip(st.columns(len(barridos)), barridos):
+                sugerida = rejilla_sugerida(p)
+                with columna:
+                    desde = st.number_input(f"{p} desde", value=float(sugerida[0]))
+                    hasta = st.number_input(f"{p} hasta", value=float(sugerida[-1]))
+                rejillas[p] = np.linspace(desde, hasta, puntos)
+
+            mecanismo = st.selectbox("Nivel evaluado", ["Peor nivel del segmento"] + sorted({PARAMETROS[p]["mecanismo"] for p in barridos}))
+            with cronometro("sensibilidad.barrido"):
+                proporciones = proporcion_niveles(
+                    inventario, rejillas, None if mecanismo == "Peor nivel del segmento" else mecanismo
+                )
+
+            if len(barridos) == 1:
+                p = barridos[0]
+                tabla = pd.DataFrame(
+                    proporciones.T * 100,
+                    columns=list(NIVELES.values()),
+                    index=pd.Index(rejillas[p].round(6), name=p),
+                )
+                st.area_chart(tabla, color=["#2ecc71", "#f39c12", "#e74c3c"], y_label="% de segmentos")
+            else:
+                metrica = st.radio("Mostrar", ["Fracción en Severo", "Fracción en Alerta o Severo"], horizontal=True)
+                z = proporciones[2] if metrica == "Fracción en Severo" else proporciones[1] + proporciones[2]
+                st.image(mapa_calor_barrido(rejillas[barridos[0]], rejillas[barridos[1]], z, barridos[0], barridos[1], metrica), width="stretch")
+
+    with tab_margen:
+        st.write("Segmentos más cercanos a cruzar al siguiente nivel (Alerta o Severo), "
+                 "por distancia relativa al umbral de su parámetro más próximo.")
+        k = st.slider("Cantidad a listar (K)", 5, 200, 20)
+        mecanismo_margen = st.selectbox("Mecanismo", ["Todos"] + MECANISMOS, key="mecanismo_margen")
+        with cronometro("sensibilidad.ranking"):
+            ranking = ranking_margenes(
+                inventario, k,
+                por_segmento=origen == "Inventario por lote",
+                mecanismo=None if mecanismo_margen == "Todos" else mecanismo_margen,
+            )
+        ranking["nivel_siguiente"] = ranking["nivel_siguiente"].map(NIVELES)
+        ranking["margen_relativo"] *= 100
+        st.dataframe(
+            ranking,
+            hide_index=True,
+            width="stretch",
+            column_config={"margen_relativo": st.column_config.NumberColumn("margen relativo (%)", format="%.2f")},
+        )
+
+
 # ==========================================================================================
 # VISTA: TABLA / VISUAL
 # ==========================================================================================
 elif vista == "Tabla / Visual":
     st.title("📚 Tabla de Mecanismos y Parámetros")
     
-    # Datos resumidos para el ejemplo
-    datos_mecanismos = {
-        "M1": [ {"Driver":"M1-D1","Parámetro":"% Agua libre (φ_water)","Tipo":"numérico (%)","Criterio":"φ_water ≥ 2%","Observaciones":"Agua en contacto con acero activa corrosión general."}, {"Driver":"M1-D2","Parámetro":"pH","Tipo":"numérico","Criterio":"pH ≤ 6","Observaciones":"Acidez favorece corrosión."}, {"Driver":"M1-D3","Parámetro":"pCO₂","Tipo":"numérico (bar)","Criterio":"≥ 0.3 bar → activo; ≥ 1 bar → severo","Observaciones":"Corrosión dulce."}, {"Driver":"M1-D4","Parámetro":"Oxígeno disuelto","Tipo":"numérico (ppb)","Criterio":"> 50 ppb en sistemas deaerated","Observaciones":"Muy corrosivo."}, {"Driver":"M1-D5","Parámetro":"Temperatura","Tipo":"numérico (°C)","Criterio":"T ≥ 40°C","Observaciones":"Aumenta la tasa de corrosión."}, {"Driver":"M1-D6","Parámetro":"Corrosion rate histórica","Tipo":"numérico (mm/año)","Criterio":"≥ 0.10 mm/año → activo; ≥ 0.30 → severo","Observaciones":"Usa cupones/UT."}, ],
-        "M2": [ {"Driver":"M2-D1","Parámetro":"Deadlegs / estancamiento","Tipo":"boolean","Criterio":"= TRUE","Observaciones":"Zonas sin barrido hidráulico."}, {"Driver":"M2-D2","Parámetro":"Interfaz líquido-gas","Tipo":"boolean","Criterio":"= TRUE","Observaciones":"Potencia pitting interno."}, {"Driver":"M2-D3","Parámetro":"Cloruros","Tipo":"numérico (ppm)","Criterio":"≥ 50–100 ppm","Observaciones":"Pitting en inox o CS recubierto."}, {"Driver":"M2-D4","Parámetro":"Velocidad baja","Tipo":"numérico (m/s)","Criterio":"≤ 0.3-0.5 m/s","Observaciones":"Permite acumulación."}, {"Driver":"M2-D5","Parámetro":"Severidad del pit","Tipo":"geométrico","Criterio":"t_min ≤ 80% del espesor promedio local","Observaciones":"Identifica pitting significativo."}, ],
-        "M3": [ {"Driver":"M3-D1","Parámetro":"Velocidad","Tipo":"numérico (m/s)","Criterio":"líquidos con sólidos ≥3; gas ≥15","Observaciones":"Ajustable por proceso"}, {"Driver":"M3-D2","Parámetro":"Sólidos en flujo","Tipo":"numérico (%)","Criterio":"≥ 0.5-1%","Observaciones":"O concentración 50-100 mg/L"}, {"Driver":"M3-D3","Parámetro":"Geometría agresiva","Tipo":"boolean","Criterio":"TRUE si codo/tee/restricción → activa","Observaciones":"Zonas turbulentas"}, {"Driver":"M3-D4","Parámetro":"Patrón visual/UT","Tipo":"boolean","Criterio":"TRUE si perfil erosivo","Observaciones":"Evidencia confirmatoria"}, ],
-        "M4": [ {"Driver":"M4-D1","Parámetro":"Aislamiento","Tipo":"boolean","Criterio":"TRUE","Observaciones":"Requisito de CUI"}, {"Driver":"M4-D2","Parámetro":"Rango temperatura CUI","Tipo":"numérico (°C)","Criterio":"Según API 583 – susceptible","Observaciones":"Referencia API 583"}, {"Driver":"M4-D3","Parámetro":"Daño en jacket","Tipo":"boolean","Criterio":"TRUE","Observaciones":"Ingreso de agua"}, {"Driver":"M4-D4","Parámetro":"Ambiente húmedo","Tipo":"boolean","Criterio":"TRUE","Observaciones":"Lluvia, lavado, procesos húmedos"}, {"Driver":"M4-D5","Parámetro":"Soportes atrapahumedad","Tipo":"boolean","Criterio":"TRUE","Observaciones":"Evidencia visual"}, ],
-        "M5": [ {"Driver":"M5-D1","Parámetro":"Depósitos internos","Tipo":"geométrico","Criterio":"≥ 1-2 mm","Observaciones":"Incrustación visible"}, {"Driver":"M5-D2","Parámetro":"Velocidad baja","Tipo":"numérico (m/s)","Criterio":"≤ 0.3-0.5 m/s","Observaciones":"Bajo barrido"}, {"Driver":"M5-D3","Parámetro":"Microbiología","Tipo":"numérico (CFU/mL)","Criterio":"≥ 10³ CFU/mL","Observaciones":"SRB u otros"}, {"Driver":"M5-D4","Parámetro":"Fluido con nutrientes","Tipo":"boolean","Criterio":"TRUE","Observaciones":"Agua sucia, hidrocarburos pesados"}, {"Driver":"M5-D5","Parámetro":"Pitting bajo depósitos","Tipo":"boolean","Criterio":"TRUE","Observaciones":"Confirmación"}, ],
-        "M12": [ {"Driver":"M12-D1","Parámetro":"T externa","Tipo":"numérico (°C)","Criterio":"T_amb < T_freezing fluido","Observaciones":"Se activa riesgo"}, {"Driver":"M12-D2","Parámetro":"Operación detenida","Tipo":"boolean","Criterio":"TRUE","Observaciones":"Línea sin flujo"}, {"Driver":"M12-D3","Parámetro":"Sin purgas","Tipo":"boolean","Criterio":"TRUE","Observaciones":"Agua atrapada"}, {"Driver":"M12-D4","Parámetro":"Sin tracing/aislamiento","Tipo":"boolean","Criterio":"TRUE","Observaciones":"Congelamiento"}, {"Driver":"M12-D5","Parámetro":"Patrón de rotura","Tipo":"boolean","Criterio":"TRUE","Observaciones":"Grieta circunferencial típica"}, ],
-    }
-    
-    for m, datos in datos_mecanismos.items():
+    # Tabla generada desde la base de reglas (reglas.yaml), una vez por proceso
+    with cronometro("tabla.construccion"):
+        tablas = tablas_mecanismos(MOTOR.version)
+    for m, tabla in tablas.items():
         with st.expander(f"{m}"):
-            st.table(pd.DataFrame(datos))
+            st.table(tabla)
 
 # ==========================================================================================
 # VISTA: MAPA CONCEPTUAL (CORREGIDA)
 # ==========================================================================================
 elif vista == "Mapa Conceptual":
-    st.title("📌 Mapa Conceptual de la Falla F1")
+    from grafos import MAX_NODOS_MAPA, construir_mapa_agregado, construir_mapa_caso, renderizar_en_segundo_plano
 
-    # 1. Validación de Session State
-    if "valores" not in st.session_state or len(st.session_state["valores"]) == 0:
-        st.warning("⚠️ Primero ingresa valores en la vista *Calculadora* y presiona 'Calcular' para generar el mapa.")
-        st.stop()
+    st.title("📌 Mapa Conceptual de la Falla F1")
 
-    st.subheader("Árbol de Influencia de Parámetros")
-    
-    # 2. Crear Grafo
-    graph = graphviz.Digraph()
-    graph.attr(rankdir='TB') 
-    
-    # Nodo Central
-    graph.node('F1', 'FALLA POTENCIAL', shape='doubleoctagon', style='filled', fillcolor='#e0e0e0', fontsize='20')
+    origenes = ["Caso de la Calculadora", "Inventario por lote (agregado)"]
+    origen = st.radio("Datos a representar", origenes, horizontal=True)
+
+    if origen == origenes[0]:
+        # 1. Validación de Session State
+        with cronometro("sesion.leer_valores"):
+            caso = st.session_state.get("caso")
+            valores_guardados = caso.caso(0).valores if caso is not None else {}
+        if len(valores_guardados) == 0:
+            st.warning("⚠️ Primero ingresa valores en la vista *Calculadora* y presiona 'Calcular' para generar el mapa.")
+            st.stop()
+
+        st.subheader("Árbol de Influencia de Parámetros")
+        with cronometro("mapa.construccion"):
+            graph = construir_mapa_caso(valores_guardados)
+    else:
+        with cronometro("sesion.leer_lote"):
+            lote = st.session_state.get("lote")
+        if lote is None:
+            st.warning("⚠️ Primero sube un inventario en la vista *Evaluación por Lote*.")
+            st.stop()
+
+        st.subheader(f"Mapa agregado — {lote['nombre']} ({len(lote['resultados'])} segmentos)")
 
-    # 3. Lógica integrada para colorear nodos
-    valores_guardados = st.session_state["valores"]
-    
-    for parametro, valor in valores_guardados.items():
-        # Recuperar reglas del diccionario global PARAMETROS
-        reglas = PARAMETROS.get(parametro)
-        
-        # Determinar estado y color
-        estado_texto = "Normal"
-        color_fondo = "#ccffcc" # Verde claro (Safe)
-
-        if reglas:
-            # Chequear Crítico Severo
-            if reglas["critico_severo"] and reglas["critico_severo"](valor):
-                estado_texto = "CRÍTICO"
-                color_fondo = "#ffcccc" # Rojo claro
-            # Chequear Crítico Normal (Alerta)
-            elif reglas["critico"](valor):
-                estado_texto = "ALERTA"
-                color_fondo = "#fff4cc" # Amarillo claro
-        
-        # Etiqueta del nodo
-        label_nodo = f"{parametro}\nVal: {valor}\n[{estado_texto}]"
-        
-        # Crear nodo y arista
-        graph.node(parametro, label_nodo, shape='box', style='filled', fillcolor=color_fondo)
-        
-        # Conectar al mecanismo correspondiente o directo a la Falla
-        mecanismo = reglas["mecanismo"] if reglas else "General"
-        
-        # Opcional: Crear nodos intermedios por mecanismo para agrupar
-        # graph.node(mecanismo, mecanismo, shape='ellipse')
-        # graph.edge(mecanismo, 'F1')
-        # graph.edge(parametro, mecanismo)
-        
-        # Conexión directa simple
-        graph.edge('F1', parametro, label=mecanismo)
-
-    st.graphviz_chart(graph, use_container_width=True)
+        col1, col2 = st.columns(2)
+        with col1:
+            detalle = st.selectbox("Detallar segmentos críticos de", ["Ninguno"] + MECANISMOS)
+        with col2:
+            max_nodos = st.slider("Máximo de nodos", min_value=20, max_value=300, value=MAX_NODOS_MAPA, step=10)
+
+        with cronometro("mapa.construccion"):
+            graph = construir_mapa_agregado(
+                lote["inventario"], lote["resultados"].a_dataframe(),
+                mecanismo_detalle=None if detalle == "Ninguno" else detalle,
+                max_nodos=max_nodos,
+            )
+
+    # Layout en un hilo aparte; mientras tanto se muestra el avance
+    with cronometro("mapa.layout"):
+        futuro = renderizar_en_segundo_plano(graph)
+        espera = st.empty()
+        inicio = time.perf_counter()
+        while not futuro.done():
+            espera.progress(min(0.95, (time.perf_counter() - inicio) / 10), text="Calculando layout del grafo…")
+            time.sleep(0.1)
+        espera.empty()
+
+    svg = futuro.result()
+    with cronometro("mapa.render"):
+        if svg:
+            st.image(svg, width="stretch")
+        else:
+            st.graphviz_chart(graph, width="stretch")
     
 # ==========================================================================================
 # VISTA: ÁRBOL DE FALLAS (MASTER) - ESTRUCTURA COMPLETA
@@ -285,67 +561,53 @@ elif vista == "Árbol de Fallas (Master)":
     st.title("🌳 Árbol Estructural Completo de Falla F1")
     st.markdown("Visualización de **todos** los mecanismos y parámetros configurados en el sistema.")
 
-    import graphviz
-
-    # Configuración del Grafo
-    master_graph = graphviz.Digraph()
-    # 'LR' (Left to Right) se ve mejor para árboles grandes que 'TB' (Top to Bottom)
-    master_graph.attr(rankdir='LR') 
-    master_graph.attr('node', shape='box', style='filled', fontname="Helvetica")
-
-    # 1. Nodo Raíz (La Falla Principal)
-    master_graph.node('ROOT', 'FALLA F1\n(Integridad)', shape='doubleoctagon', fillcolor='#2c3e50', fontcolor='white', fontsize='16')
-
-    # 2. Definir los Mecanismos (Nivel 1)
-    # Creamos un diccionario auxiliar para dar nombres bonitos a los mecanismos
-    nombres_mecanismos = {
-        "M1": "Corrosión General\n(Química)",
-        "M2": "Corrosión Localizada\n(Pitting/Estancamiento)",
-        "M3": "Erosión / Mecánica\n(Velocidad)",
-        "M4": "CUI / Externo\n(Aislamiento)",
-        "M5": "MIC / Depósitos\n(Biológico)",
-        "M12": "Falla Física\n(Frío/Rotura)"
-    }
+    from grafos import arbol_master
 
-    # 3. Construir la estructura iterando sobre PARAMETROS
-    
-    # Primero creamos los nodos de Mecanismos para asegurar el orden
-    for codigo_mec, nombre_desc in nombres_mecanismos.items():
-        # Nodo de Mecanismo (Color Azulado)
-        master_graph.node(codigo_mec, f"🛡️ {codigo_mec}\n{nombre_desc}", shape='ellipse', fillcolor='#d6eaf8', fontsize='12')
-        # Conectar Raíz -> Mecanismo
-        master_graph.edge('ROOT', codigo_mec, penwidth='2')
-
-    # Ahora buscamos los parámetros (Hijos) en tu base de datos
-    for param_key, data in PARAMETROS.items():
-        mec_padre = data['mecanismo']
-        
-        # Formatear el nombre del parámetro para que se lea bien (quitar guiones bajos)
-        nombre_visible = param_key.replace('_', ' ').capitalize()
-        
-        # Añadir info extra en el nodo (opcional)
-        info_extra = ""
-        if data['tipo'] == 'bool':
-            info_extra = "\n(Si/No)"
-        elif data['tipo'] == 'num':
-            info_extra = "\n(Numérico)"
-
-        label_nodo = f"{nombre_visible}{info_extra}"
-        
-        # Nodo Parámetro (Color Blanco/Gris claro)
-        master_graph.node(param_key, label_nodo, fillcolor='white', fontsize='10', color='#aaaaaa')
-        
-        # Conectar Mecanismo -> Parámetro
-        if mec_padre in nombres_mecanismos:
-            master_graph.edge(mec_padre, param_key, color='#aaaaaa')
-        else:
-            # Por si tienes un mecanismo en PARAMETROS que no definimos en nombres_mecanismos
-            master_graph.node(mec_padre, mec_padre, shape='ellipse', fillcolor='#d6eaf8')
-            master_graph.edge('ROOT', mec_padre)
-            master_graph.edge(mec_padre, param_key)
+    # El árbol solo cambia con la base de reglas: se construye y renderiza una vez por
+    # versión y se sirve desde la caché del proceso a todas las sesiones
+    with cronometro("master.construccion"):
+        dot_master, svg_master = arbol_master()
 
     # Mostrar el gráfico ocupando todo el ancho
-    st.graphviz_chart(master_graph, width="stretch")
-
+    with cronometro("master.render"):
+        if svg_master:
+            st.image(svg_master, width="stretch")
+        else:
+            st.graphviz_chart(dot_master, width="stretch")
 
+# ==========================================================================================
+# TIEMPO DE EJECUCIÓN
+# ==========================================================================================
+duracion_ms = (time.perf_counter() - _inicio_script) * 1000
+METRICAS.registrar(f"script.{vista}", duracion_ms, st.session_state["id_sesion"])
+arranque = registro_arranque()
+arranque.setdefault("primera_ms", duracion_ms)
+marcador_tiempo.caption(f"⏱️ Esta ejecución: {duracion_ms:.0f} ms · primera del proceso: {arranque['primera_ms']:.0f} ms")
 
+# ==========================================================================================
+# PANEL DE RENDIMIENTO (OPCIONAL)
+# ==========================================================================================
+with panel_rendimiento:
+    if st.toggle("Rendimiento"):
+        muestras_sesion = st.session_state["metricas"]
+        agregado = METRICAS.resumen()
+        filas = []
+        for etapa, stats in agregado.items():
+            sesion = estadisticas(muestras_sesion.get(etapa, []))
+            filas.append({
+                "Etapa": etapa,
+                "Sesión p50": round(sesion["p50_ms"], 1),
+                "Sesión p95": round(sesion["p95_ms"], 1),
+                "Proceso p50": round(stats["p50_ms"], 1),
+                "Proceso p95": round(stats["p95_ms"], 1),
+                "Proceso p99": round(stats["p99_ms"], 1),
+                "n": stats["n"],
+            })
+        st.caption("Tiempos en ms por etapa (sesión actual y todas las sesiones del proceso).")
+        st.dataframe(filas, hide_index=True, width="stretch")
+        st.download_button(
+            "Exportar métricas (JSON)",
+            METRICAS.exportar(muestras_sesion),
+            file_name="metricas_rendimiento.json",
+            mime="application/json",
+        )
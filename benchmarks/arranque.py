@@ -0,0 +1,68 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+# ==========================================================================================
+# TIEMPO DE ARRANQUE Y DE RERUN POR VISTA
+# ==========================================================================================
+#
+#   python benchmarks/arranque.py [--app app8.py] [--reruns 5]
+#
+# Cada vista se mide en un proceso nuevo: la primera ejecución incluye la carga de
+# módulos y recursos estáticos (arranque en frío); las siguientes son reruns normales
+# de Streamlit, como cuando el usuario interactúa con un widget.
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+VISTAS = ["Calculadora", "Evaluación por Lote", "Historial", "Monitoreo en Línea", "Sensibilidad", "Tabla / Visual", "Mapa Conceptual", "Árbol de Fallas (Master)"]
+
+_MEDICION = r"""
+import json, sys, time
+from streamlit.testing.v1 import AppTest
+
+app, vista, reruns = sys.argv[1], sys.argv[2], int(sys.argv[3])
+at = AppTest.from_file(app, default_timeout=120)
+at.session_state["vista"] = vista
+
+inicio = time.perf_counter()
+at.run()
+frio = time.perf_counter() - inicio
+
+tiempos = []
+for _ in range(reruns):
+    inicio = time.perf_counter()
+    at.run()
+    tiempos.append(time.perf_counter() - inicio)
+
+print(json.dumps({"frio_ms": frio * 1000, "rerun_ms": 1000 * sorted(tiempos)[len(tiempos) // 2],
+                  "excepcion": bool(at.exception)}))
+"""
+
+
+def medir_vista(app, vista, reruns):
+    salida = subprocess.run(
+        [sys.executable, "-c", _MEDICION, app, vista, str(reruns)],
+        capture_output=True, text=True, check=True, cwd=os.path.dirname(app),
+    )
+    return json.loads(salida.stdout.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mide el arranque en frío y los reruns de cada vista.")
+    parser.add_argument("--app", default=os.path.join(RAIZ, "app8.py"))
+    parser.add_argument("--reruns", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    app = os.path.abspath(args.app)
+    print(f"{'Vista':<28}{'Arranque (ms)':>15}{'Rerun p50 (ms)':>16}")
+    for vista in VISTAS:
+        r = medir_vista(app, vista, args.reruns)
+        nota = "  (excepción)" if r["excepcion"] else ""
+        print(f"{vista:<28}{r['frio_ms']:>15.0f}{r['rerun_ms']:>16.1f}{nota}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
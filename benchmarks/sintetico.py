@@ -0,0 +1,42 @@
+import numpy as np
+import pandas as pd
+
+from evaluacion import COLUMNA_ACTIVO
+from parametros import MOTOR
+
+# ==========================================================================================
+# INVENTARIOS SINTÉTICOS PARA BENCHMARKS
+# ==========================================================================================
+
+
+def inventario_sintetico(n, semilla=0, fraccion_vacios=0.1, motor=MOTOR):
+    """
+    Inventario de `n` segmentos con todos los parámetros de la base de reglas.
+
+    Los valores numéricos se distribuyen alrededor del primer umbral de cada
+    parámetro para que haya segmentos en Normal, Alerta y Severo; una fracción
+    de celdas queda vacía como en un inventario real.
+    """
+    rng = np.random.default_rng(semilla)
+    columnas = {COLUMNA_ACTIVO: np.char.add("L", np.arange(n).astype(str))}
+
+    for p, info in motor.parametros.items():
+        if info["tipo"] == "bool":
+            columnas[p] = rng.random(n) < 0.3
+        else:
+            umbral = float(info["reglas"][0].umbral)
+            valores = rng.normal(umbral, abs(umbral) * 0.5 + 1, n)
+            valores[rng.random(n) < fraccion_vacios] = np.nan
+            columnas[p] = valores
+
+    return pd.DataFrame(columnas)
+
+
+def caso_sintetico(inventario, fila=0):
+    """Fila del inventario como dict parámetro -> valor, igual que en la Calculadora."""
+    valores = {}
+    for p, v in inventario.iloc[fila].items():
+        if p == COLUMNA_ACTIVO or v != v:
+            continue
+        valores[p] = bool(v) if MOTOR.parametros[p]["tipo"] == "bool" else float(v)
+    return valores
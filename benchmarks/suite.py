@@ -0,0 +1,242 @@
+import argparse
+import gc
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.sintetico import caso_sintetico, inventario_sintetico
+from evaluacion import evaluar_lote, evaluar_lote_compacto, evaluar_valores
+from graficos import grafico_activados, grafico_severidad, graficos_caso, resumen_severidad
+from grafos import construir_arbol_master, construir_mapa_agregado, construir_mapa_caso
+from parametros import MOTOR
+from sensibilidad import proporcion_niveles, ranking_margenes, rejilla_sugerida
+
+# ==========================================================================================
+# SUITE DE BENCHMARKS (SIN STREAMLIT)
+# ==========================================================================================
+#
+#   python benchmarks/suite.py                          # todas las escalas
+#   python benchmarks/suite.py --escalas 1,1000 --guardar v1
+#   python benchmarks/suite.py --comparar v1            # falla si hay regresiones
+#
+# Cada caso se mide sobre inventarios sintéticos de 1 a 1.000.000 segmentos. Se informa
+# la latencia por llamada (p50/p95/p99), el throughput en segmentos por segundo y el pico
+# de memoria (tracemalloc, en una pasada aparte para no distorsionar los tiempos).
+
+DIR_BASELINES = os.path.join(RAIZ, "benchmarks", "baselines")
+
+ESCALAS = [1, 10, 100, 1_000, 10_000, 100_000, 1_000_000]
+
+
+def _preparar_caso(n):
+    inventario = inventario_sintetico(n)
+    valores = [caso_sintetico(inventario, i) for i in range(n)]
+    return lambda: [evaluar_valores(v) for v in valores]
+
+
+def _preparar_lote(n):
+    inventario = inventario_sintetico(n)
+    return lambda: evaluar_lote(inventario)
+
+
+def _preparar_lote_compacto(n):
+    inventario = inventario_sintetico(n)
+    return lambda: evaluar_lote_compacto(inventario)
+
+
+def _casos_evaluados(n):
+    inventario = inventario_sintetico(n)
+    return [evaluar_valores(caso_sintetico(inventario, i)) for i in range(n)]
+
+
+def _preparar_graficos_sin_cache(n):
+    casos = _casos_evaluados(n)
+
+    def medir():
+        grafico_activados.cache_clear()
+        grafico_severidad.cache_clear()
+        for activados, severidad, _ in casos:
+            graficos_caso(activados, severidad)
+
+    return medir
+
+
+def _preparar_graficos_en_cache(n):
+    casos = _casos_evaluados(n)
+    for activados, severidad, _ in casos:
+        graficos_caso(activados, severidad)
+    return lambda: [graficos_caso(activados, severidad) for activados, severidad, _ in casos]
+
+
+def _preparar_resumen(n):
+    resultados = evaluar_lote(inventario_sintetico(n))
+    return lambda: resumen_severidad(resultados)
+
+
+def _preparar_arbol_master(n):
+    return lambda: construir_arbol_master().source
+
+
+def _preparar_mapa_caso(n):
+    valores = caso_sintetico(inventario_sintetico(1))
+    return lambda: construir_mapa_caso(valores).source
+
+
+def _preparar_mapa_agregado(n):
+    inventario = inventario_sintetico(n)
+    resultados = evaluar_lote(inventario)
+    return lambda: construir_mapa_agregado(inventario, resultados, mecanismo_detalle="M1").source
+
+
+def _preparar_barrido(n):
+    inventario = inventario_sintetico(n)
+    rejillas = {"corrosion_rate": rejilla_sugerida("corrosion_rate"), "ph": rejilla_sugerida("ph")}
+    return lambda: proporcion_niveles(inventario, rejillas)
+
+
+def _preparar_ranking_margenes(n):
+    inventario = inventario_sintetico(n)
+    return lambda: ranking_margenes(inventario, k=20)
+
+
+# nombre: (preparación, escala máxima, ¿los segmentos escalan con n?)
+CASOS = {
+    "evaluacion_caso": (_preparar_caso, 10_000, True),
+    "evaluacion_lote": (_preparar_lote, None, True),
+    "evaluacion_compacta": (_preparar_lote_compacto, None, True),
+    "graficos_sin_cache": (_preparar_graficos_sin_cache, 10, True),
+    "graficos_en_cache": (_preparar_graficos_en_cache, 100, True),
+    "resumen_severidad": (_preparar_resumen, None, True),
+    "arbol_master": (_preparar_arbol_master, 1, False),
+    "mapa_caso": (_preparar_mapa_caso, 1, False),
+    "mapa_agregado": (_preparar_mapa_agregado, None, True),
+    "barrido_2d": (_preparar_barrido, 100_000, True),
+    "ranking_margenes": (_preparar_ranking_margenes, None, True),
+}
+
+
+def medir(funcion, segmentos, tiempo_min=0.5, repeticiones_min=3, repeticiones_max=200):
+    """Ejecuta `funcion` varias veces y devuelve latencias, throughput y pico de memoria."""
+    funcion()  # calentamiento (imports, cachés de numpy, etc.)
+
+    tiempos = []
+    inicio_total = time.perf_counter()
+    while len(tiempos) < repeticiones_min or (
+        time.perf_counter() - inicio_total < tiempo_min and len(tiempos) < repeticiones_max
+    ):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append(time.perf_counter() - inicio)
+
+    gc.collect()
+    tracemalloc.start()
+    funcion()
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    latencias = np.array(tiempos) * 1000
+    p50 = float(np.percentile(latencias, 50))
+    return {
+        "repeticiones": len(tiempos),
+        "p50_ms": p50,
+        "p95_ms": float(np.percentile(latencias, 95)),
+        "p99_ms": float(np.percentile(latencias, 99)),
+        "segmentos_s": segmentos / (p50 / 1000) if p50 > 0 else float("inf"),
+        "pico_mb": pico / 2**20,
+    }
+
+
+def ejecutar(casos, escalas, tiempo_min):
+    resultados = {}
+    for nombre in casos:
+        preparar, escala_max, escala_segmentos = CASOS[nombre]
+        for n in escalas:
+            if escala_max is not None and n > escala_max:
+                continue
+            funcion = preparar(n)
+            r = medir(funcion, n if escala_segmentos else 1, tiempo_min)
+            resultados[f"{nombre}@{n}"] = r
+            print(f"{nombre:<22}{n:>10}{r['p50_ms']:>12.3f}{r['p95_ms']:>12.3f}{r['p99_ms']:>12.3f}"
+                  f"{r['segmentos_s']:>16,.0f}{r['pico_mb']:>12.1f}", flush=True)
+            del funcion
+            gc.collect()
+    return resultados
+
+
+def metadatos():
+    return {
+        "fecha": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "maquina": platform.platform(),
+        "version_reglas": MOTOR.version,
+    }
+
+
+def comparar(actual, base, tolerancia):
+    """Imprime la razón p50 actual/base por caso y devuelve la lista de regresiones."""
+    regresiones = []
+    print(f"\n{'Caso':<34}{'base p50':>12}{'actual p50':>12}{'razón':>8}")
+    for clave, r in actual.items():
+        if clave not in base:
+            continue
+        razon = r["p50_ms"] / base[clave]["p50_ms"] if base[clave]["p50_ms"] > 0 else 1.0
+        marca = ""
+        if razon > 1 + tolerancia:
+            marca = "  REGRESIÓN"
+            regresiones.append(clave)
+        print(f"{clave:<34}{base[clave]['p50_ms']:>12.3f}{r['p50_ms']:>12.3f}{razon:>8.2f}{marca}")
+    return regresiones
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks de evaluación, gráficos y grafos.")
+    parser.add_argument("--escalas", default=",".join(map(str, ESCALAS)),
+                        help="Tamaños de inventario separados por coma")
+    parser.add_argument("--casos", default=",".join(CASOS), help="Casos a ejecutar separados por coma")
+    parser.add_argument("--tiempo-min", type=float, default=0.5, help="Segundos mínimos de medición por caso")
+    parser.add_argument("--guardar", metavar="NOMBRE", help="Guarda los resultados como baseline NOMBRE")
+    parser.add_argument("--comparar", metavar="NOMBRE", help="Compara contra la baseline NOMBRE")
+    parser.add_argument("--tolerancia", type=float, default=0.15,
+                        help="Aumento relativo de p50 tolerado antes de marcar regresión (por defecto 0.15)")
+    args = parser.parse_args(argv)
+
+    escalas = [int(e) for e in args.escalas.split(",")]
+    casos = [c for c in args.casos.split(",") if c]
+    desconocidos = [c for c in casos if c not in CASOS]
+    if desconocidos:
+        parser.error(f"casos desconocidos: {', '.join(desconocidos)}")
+
+    print(f"{'Caso':<22}{'N':>10}{'p50 (ms)':>12}{'p95 (ms)':>12}{'p99 (ms)':>12}{'segmentos/s':>16}{'pico (MB)':>12}")
+    resultados = ejecutar(casos, escalas, args.tiempo_min)
+
+    if args.guardar:
+        os.makedirs(DIR_BASELINES, exist_ok=True)
+        ruta = os.path.join(DIR_BASELINES, f"{args.guardar}.json")
+        with open(ruta, "w", encoding="utf-8") as f:
+            json.dump({"meta": metadatos(), "resultados": resultados}, f, indent=2, ensure_ascii=False)
+        print(f"\nBaseline guardada en {ruta}")
+
+    if args.comparar:
+        with open(os.path.join(DIR_BASELINES, f"{args.comparar}.json"), encoding="utf-8") as f:
+            base = json.load(f)
+        regresiones = comparar(resultados, base["resultados"], args.tolerancia)
+        if regresiones:
+            print(f"\n{len(regresiones)} regresiones respecto de '{args.comparar}'")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,167 @@
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from evaluacion import COLUMNA_ACTIVO, evaluar_lote, leer_inventario_por_bloques
+from historial import RUTA_HISTORIAL, Historial, filas_historial
+from rendimiento import procesos_disponibles
+
+# ==========================================================================================
+# EVALUACIÓN POR LÍNEA DE COMANDOS (SIN STREAMLIT)
+# ==========================================================================================
+#
+#   python cli.py inventario.csv -o resultados.parquet
+#   python cli.py inventario.csv -o resultados.csv --reportes reportes/
+#
+# El inventario se lee por bloques y cada bloque se evalúa en un proceso del pool.
+# Solo hay unos pocos bloques en memoria a la vez y los resultados se escriben en
+# el orden de entrada a medida que terminan. Con --reportes, el mismo proceso que
+# evalúa un bloque escribe además un PDF por segmento. La base de reglas se puede
+# cambiar con la variable de entorno SIMEF_REGLAS.
+
+# Sin columna `activo`, la salida lleva el número de fila del inventario con este nombre:
+# es la misma clave que usan el historial y los reportes (segmento_<n>.pdf)
+COLUMNA_SEGMENTO = "segmento"
+
+
+class EscritorResultados:
+    """Escribe bloques de resultados de forma incremental en CSV o Parquet."""
+
+    def __init__(self, ruta):
+        self.ruta = ruta
+        self.parquet = str(ruta).lower().endswith(".parquet")
+        self._archivo = None
+        self._escritor = None
+        self._esquema = None
+
+    def escribir(self, df):
+        if self.parquet:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            if self._escritor is None:
+                tabla = pa.Table.from_pandas(df, preserve_index=False)
+                self._esquema = tabla.schema
+                self._escritor = pq.ParquetWriter(self.ruta, self._esquema)
+            else:
+                # Mismo esquema en todos los bloques aunque una columna venga vacía
+                tabla = pa.Table.from_pandas(df, schema=self._esquema, preserve_index=False)
+            self._escritor.write_table(tabla)
+        else:
+            primero = self._archivo is None
+            if primero:
+                self._archivo = open(self.ruta, "w", encoding="utf-8", newline="")
+            df.to_csv(self._archivo, header=primero, index=False)
+
+    def cerrar(self):
+        if self._escritor is not None:
+            self._escritor.close()
+        if self._archivo is not None:
+            self._archivo.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cerrar()
+
+
+def _evaluar_bloque(bloque, reportes=None, corrida=None):
+    # `corrida` = (id, fecha): las filas del historial (JSON incluido) se arman aquí, en
+    # el proceso del pool, y el proceso principal solo ejecuta los INSERT
+    resultado = evaluar_lote(bloque)
+    if COLUMNA_ACTIVO not in resultado.columns:
+        resultado.insert(0, COLUMNA_SEGMENTO, resultado.index)
+    if reportes is not None:
+        from reportes import escribir_reportes
+
+        escribir_reportes(bloque, resultado, *reportes)
+    filas = filas_historial(*corrida, bloque, resultado) if corrida is not None else None
+    return resultado, filas
+
+
+def _guardar(futuro, escritor, historial):
+    resultado, filas = futuro.result()
+    escritor.escribir(resultado)
+    if historial is not None:
+        historial.insertar_filas(*filas)
+    return len(resultado)
+
+
+def procesar_inventario(entrada, salida, tamano_bloque=50_000, procesos=None, historial=None, directorio_reportes=None):
+    """
+    Evalúa `entrada` en paralelo y escribe los resultados en `salida`. Si se pasa un
+    `Historial`, cada bloque se agrega además a una nueva corrida; con `directorio_reportes`
+    se escribe un PDF por segmento en ese directorio. Devuelve las filas procesadas.
+    """
+    procesos = procesos or procesos_disponibles()
+    corrida = None
+    if historial is not None:
+        corrida_id = historial.iniciar_corrida(f"cli:{os.path.basename(entrada)}")
+        corrida = (corrida_id, historial.fecha_corrida(corrida_id))
+    # Bloques en vuelo: suficiente para mantener ocupado el pool sin acumular el archivo en memoria
+    max_pendientes = 2 * procesos
+    pendientes = deque()
+    filas = 0
+
+    directorio_imagenes = None
+    if directorio_reportes:
+        from reportes import identificadores, imagen_master, nombres_archivo
+
+        os.makedirs(directorio_reportes, exist_ok=True)
+        directorio_imagenes = tempfile.mkdtemp(prefix="simef_imagenes_")
+        ruta_master = imagen_master(directorio_imagenes)
+        nombres_vistos = {}
+
+    try:
+        with ProcessPoolExecutor(max_workers=procesos) as pool, EscritorResultados(salida) as escritor:
+            for bloque in leer_inventario_por_bloques(entrada, tamano_bloque):
+                reportes = None
+                if directorio_reportes:
+                    nombres = nombres_archivo(identificadores(bloque), nombres_vistos)
+                    reportes = (nombres, directorio_reportes, directorio_imagenes, ruta_master)
+                pendientes.append(pool.submit(_evaluar_bloque, bloque, reportes, corrida))
+                if len(pendientes) >= max_pendientes:
+                    filas += _guardar(pendientes.popleft(), escritor, historial)
+
+            while pendientes:
+                filas += _guardar(pendientes.popleft(), escritor, historial)
+    finally:
+        if directorio_imagenes:
+            shutil.rmtree(directorio_imagenes, ignore_errors=True)
+
+    return filas
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Evalúa los mecanismos de falla de un inventario completo de tuberías."
+    )
+    parser.add_argument("entrada", help="Inventario CSV o Parquet (una fila por segmento)")
+    parser.add_argument("-o", "--salida", required=True, help="Archivo de resultados (.csv o .parquet)")
+    parser.add_argument("--tamano-bloque", type=int, default=50_000, help="Filas por bloque (por defecto 50000)")
+    parser.add_argument("--procesos", type=int, default=None,
+                        help="Procesos del pool (por defecto, los núcleos disponibles)")
+    parser.add_argument("--historial", nargs="?", const=RUTA_HISTORIAL, default=None,
+                        help="Guarda la corrida en el historial SQLite (por defecto historial.sqlite)")
+    parser.add_argument("--reportes", metavar="DIRECTORIO", help="Escribe un reporte PDF por segmento en DIRECTORIO")
+    args = parser.parse_args(argv)
+
+    historial = Historial(args.historial) if args.historial else None
+
+    inicio = time.perf_counter()
+    filas = procesar_inventario(args.entrada, args.salida, args.tamano_bloque, args.procesos, historial, args.reportes)
+    duracion = time.perf_counter() - inicio
+
+    print(f"{filas} segmentos evaluados en {duracion:.1f} s "
+          f"({filas / max(duracion, 1e-9):,.0f} segmentos/s) → {args.salida}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,105 @@
+import numpy as np
+import pandas as pd
+
+from parametros import MECANISMOS, MOTOR, PARAMETROS
+from resultados import COLUMNA_ACTIVO, ResultadoLote
+
+# ==========================================================================================
+# EVALUACIÓN DE MECANISMOS (CASO ÚNICO Y POR LOTE)
+# ==========================================================================================
+
+VALORES_VERDADEROS = {"true", "1", "1.0", "si", "sí", "yes", "verdadero"}
+
+
+def evaluar_valores(valores):
+    """Evalúa un caso único (dict parámetro -> valor) con la lógica de la Calculadora."""
+    activados = {m: 0 for m in MECANISMOS}
+    severidad = {m: 0 for m in activados}
+    drivers_activados = {m: [] for m in activados}
+
+    for p, v in valores.items():
+        mec = PARAMETROS[p]["mecanismo"]
+        cumplidas, nivel = MOTOR.clasificar(p, v)
+
+        if cumplidas:
+            activados[mec] += cumplidas
+            severidad[mec] = max(severidad[mec], nivel)
+            drivers_activados[mec].append(p)
+
+    return activados, severidad, drivers_activados
+
+
+def a_booleano(serie):
+    # Acepta True/False nativos y textos habituales de planillas (TRUE, 1, Sí...).
+    # Celdas vacías cuentan como "no evaluado", igual que un parámetro no seleccionado.
+    if serie.dtype == bool:
+        return serie.to_numpy()
+    texto = serie.astype("string").str.strip().str.lower()
+    return texto.isin(VALORES_VERDADEROS).fillna(False).to_numpy(dtype=bool)
+
+
+def a_numerico(serie):
+    # Las celdas vacías o no numéricas quedan como NaN y no activan ningún criterio
+    return pd.to_numeric(serie, errors="coerce").to_numpy(dtype=float)
+
+
+def evaluar_lote_compacto(df):
+    """
+    Evalúa un inventario completo (una fila por segmento, una columna por parámetro)
+    y devuelve un `ResultadoLote` con arreglos de ancho fijo y máscaras de drivers.
+
+    Cada columna se clasifica completa con el motor de reglas compilado, con el
+    mismo resultado que `evaluar_valores` fila por fila. Las columnas ausentes o las
+    celdas vacías se tratan como parámetros no ingresados.
+    """
+    activos = df[COLUMNA_ACTIVO].to_numpy() if COLUMNA_ACTIVO in df.columns else None
+    resultado = ResultadoLote.vacio(len(df), activos, df.index)
+
+    for m, parametros in MOTOR.por_mecanismo.items():
+        activados, severidad, mascara = resultado.activados[m], resultado.severidad[m], resultado.mascaras[m]
+        for bit, p in enumerate(parametros):
+            if p not in df.columns:
+                continue
+
+            if PARAMETROS[p]["tipo"] == "bool":
+                columna = a_booleano(df[p])
+            else:
+                columna = a_numerico(df[p])
+            cumplidas, nivel = MOTOR.clasificar_arreglo(p, columna)
+
+            activados += cumplidas.astype(activados.dtype)
+            np.maximum(severidad, nivel.astype(severidad.dtype), out=severidad)
+            mascara |= (cumplidas > 0).astype(mascara.dtype) << mascara.dtype.type(bit)
+
+    return resultado
+
+
+def evaluar_lote(df):
+    """Evalúa un inventario completo; DataFrame con activados, severidad y drivers (texto) por mecanismo."""
+    return evaluar_lote_compacto(df).a_dataframe()
+
+
+def leer_inventario(archivo, nombre=None):
+    """Lee un inventario CSV o Parquet (ruta o archivo subido en Streamlit)."""
+    nombre = (nombre or getattr(archivo, "name", None) or str(archivo)).lower()
+    if nombre.endswith(".parquet"):
+        return pd.read_parquet(archivo)
+    return pd.read_csv(archivo)
+
+
+def leer_inventario_por_bloques(ruta, tamano_bloque=50_000):
+    """Recorre un inventario CSV o Parquet en bloques de `tamano_bloque` filas sin cargarlo entero."""
+    if str(ruta).lower().endswith(".parquet"):
+        import pyarrow.parquet as pq
+
+        archivo = pq.ParquetFile(ruta)
+        desplazamiento = 0
+        for lote in archivo.iter_batches(batch_size=tamano_bloque):
+            # Índice continuo entre bloques (como en CSV): sin columna `activo` es el identificador
+            bloque = lote.to_pandas()
+            bloque.index += desplazamiento
+            desplazamiento += len(bloque)
+            yield bloque
+    else:
+        # El identificador se lee como texto para que todos los bloques tengan el mismo tipo
+        yield from pd.read_csv(ruta, chunksize=tamano_bloque, dtype={COLUMNA_ACTIVO: str})
@@ -0,0 +1,92 @@
+import io
+from functools import lru_cache
+
+import pandas as pd
+
+from parametros import MECANISMOS
+
+# ==========================================================================================
+# GRÁFICOS DE RESULTADOS (CON CACHÉ)
+# ==========================================================================================
+
+COLORES_SEVERIDAD = {0: "green", 1: "orange", 2: "red"}
+
+# matplotlib se importa dentro de las funciones de dibujo: la vista por lote solo usa
+# `resumen_severidad` y no necesita cargarlo.
+
+# Cantidad de pares (mecanismos, vector) distintos que se conservan renderizados
+MAX_GRAFICOS_EN_CACHE = 256
+
+
+def _a_png(fig):
+    # Se usa Figure directamente (no pyplot), así la figura nunca entra en el registro
+    # global de pyplot y se libera al salir de la función.
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format="png", bbox_inches="tight")
+    fig.clear()
+    return buffer.getvalue()
+
+
+@lru_cache(maxsize=MAX_GRAFICOS_EN_CACHE)
+def grafico_activados(mecanismos, activados):
+    """PNG del gráfico 'Parámetros Activados'. Recibe tuplas para poder cachearse."""
+    from matplotlib.figure import Figure
+
+    fig = Figure()
+    ax = fig.subplots()
+    ax.bar(mecanismos, activados, color='skyblue')
+    ax.set_title("Parámetros Activados")
+    return _a_png(fig)
+
+
+@lru_cache(maxsize=MAX_GRAFICOS_EN_CACHE)
+def grafico_severidad(mecanismos, severidad):
+    """PNG del gráfico 'Nivel de Severidad'. Recibe tuplas para poder cachearse."""
+    from matplotlib.figure import Figure
+
+    fig = Figure()
+    ax = fig.subplots()
+    ax.bar(mecanismos, severidad, color=[COLORES_SEVERIDAD[s] for s in severidad])
+    ax.set_title("Nivel de Severidad")
+    return _a_png(fig)
+
+
+def mapa_calor_barrido(x, y, z, etiqueta_x, etiqueta_y, titulo):
+    """PNG de un barrido de dos parámetros; `z` tiene forma (len(x), len(y)) y valores en [0, 1]."""
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=(7, 5))
+    ax = fig.subplots()
+    malla = ax.pcolormesh(x, y, z.T, cmap="RdYlGn_r", vmin=0, vmax=1, shading="auto")
+    fig.colorbar(malla, ax=ax, label="Fracción de segmentos")
+    ax.set_xlabel(etiqueta_x)
+    ax.set_ylabel(etiqueta_y)
+    ax.set_title(titulo)
+    return _a_png(fig)
+
+
+def graficos_caso(activados, severidad):
+    """Devuelve (png_activados, png_severidad) para los dicts de `evaluar_valores`."""
+    mecanismos = tuple(activados)
+    return (
+        grafico_activados(mecanismos, tuple(activados.values())),
+        grafico_severidad(mecanismos, tuple(severidad[m] for m in mecanismos)),
+    )
+
+
+def resumen_severidad(resultados):
+    """
+    Segmentos por mecanismo y nivel (Normal/Alerta/Severo) para resultados por lote.
+
+    Pensado para los gráficos nativos de Streamlit (`st.bar_chart`), que agregan
+    miles de segmentos sin pasar por matplotlib.
+    """
+    resumen = pd.DataFrame(
+        {
+            "Normal": [(resultados[f"{m}_severidad"] == 0).sum() for m in MECANISMOS],
+            "Alerta": [(resultados[f"{m}_severidad"] == 1).sum() for m in MECANISMOS],
+            "Severo": [(resultados[f"{m}_severidad"] == 2).sum() for m in MECANISMOS],
+        },
+        index=pd.Index(MECANISMOS, name="Mecanismo"),
+    )
+    return resumen
@@ -0,0 +1,297 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import graphviz
+import numpy as np
+
+from parametros import MOTOR
+from reglas import NIVELES
+
+# ==========================================================================================
+# GRAFOS GRAPHVIZ
+# ==========================================================================================
+
+# Árbol master ya construido, por versión de la base de reglas: {version: (dot, svg)}.
+# Se comparte entre todas las sesiones del proceso.
+_ARBOLES_MASTER = {}
+_LOCK_ARBOLES = threading.Lock()
+
+# Layouts de `dot` en curso o terminados, por hash del DOT (LRU acotado)
+_LAYOUTS = OrderedDict()
+_LOCK_LAYOUTS = threading.Lock()
+_MAX_LAYOUTS = 32
+_POOL_LAYOUT = ThreadPoolExecutor(max_workers=2, thread_name_prefix="layout-graphviz")
+
+# Tope de nodos del mapa agregado y de segmentos mostrados al detallar un mecanismo
+MAX_NODOS_MAPA = 60
+MAX_SEGMENTOS_DETALLE = 25
+
+COLORES_NIVEL = {0: "#ccffcc", 1: "#fff4cc", 2: "#ffcccc"}
+
+
+def construir_arbol_master(motor=MOTOR):
+    """Construye el `graphviz.Digraph` con todos los mecanismos y parámetros de la base de reglas."""
+    # Configuración del Grafo
+    master_graph = graphviz.Digraph()
+    # 'LR' (Left to Right) se ve mejor para árboles grandes que 'TB' (Top to Bottom)
+    master_graph.attr(rankdir='LR')
+    master_graph.attr('node', shape='box', style='filled', fontname="Helvetica")
+
+    # 1. Nodo Raíz (La Falla Principal)
+    master_graph.node('ROOT', 'FALLA F1\n(Integridad)', shape='doubleoctagon', fillcolor='#2c3e50', fontcolor='white', fontsize='16')
+
+    # 2. Definir los Mecanismos (Nivel 1)
+    # Los nombres descriptivos de cada mecanismo vienen de la base de reglas
+    nombres_mecanismos = motor.nombres_mecanismos
+
+    # 3. Construir la estructura iterando sobre PARAMETROS
+
+    # Primero creamos los nodos de Mecanismos para asegurar el orden
+    for codigo_mec, nombre_desc in nombres_mecanismos.items():
+        # Nodo de Mecanismo (Color Azulado)
+        master_graph.node(codigo_mec, f"🛡️ {codigo_mec}\n{nombre_desc}", shape='ellipse', fillcolor='#d6eaf8', fontsize='12')
+        # Conectar Raíz -> Mecanismo
+        master_graph.edge('ROOT', codigo_mec, penwidth='2')
+
+    # Ahora buscamos los parámetros (Hijos) en tu base de datos
+    for param_key, data in motor.parametros.items():
+        mec_padre = data['mecanismo']
+
+        # Formatear el nombre del parámetro para que se lea bien (quitar guiones bajos)
+        nombre_visible = param_key.replace('_', ' ').capitalize()
+
+        # Añadir info extra en el nodo (opcional)
+        info_extra = ""
+        if data['tipo'] == 'bool':
+            info_extra = "\n(Si/No)"
+        elif data['tipo'] == 'num':
+            info_extra = "\n(Numérico)"
+
+        label_nodo = f"{nombre_visible}{info_extra}\n{motor.criterio_texto(param_key)}"
+
+        # Nodo Parámetro (Color Blanco/Gris claro)
+        master_graph.node(param_key, label_nodo, fillcolor='white', fontsize='10', color='#aaaaaa')
+
+        # Conectar Mecanismo -> Parámetro
+        if mec_padre in nombres_mecanismos:
+            master_graph.edge(mec_padre, param_key, color='#aaaaaa')
+        else:
+            # Por si tienes un mecanismo en PARAMETROS que no definimos en nombres_mecanismos
+            master_graph.node(mec_padre, mec_padre, shape='ellipse', fillcolor='#d6eaf8')
+            master_graph.edge('ROOT', mec_padre)
+            master_graph.edge(mec_padre, param_key)
+
+    return master_graph
+
+
+def renderizar_svg(graph):
+    """Renderiza el grafo a SVG con el binario `dot`; devuelve None si Graphviz no está instalado."""
+    try:
+        return graph.pipe(format="svg").decode("utf-8")
+    except graphviz.ExecutableNotFound:
+        return None
+
+
+def renderizar_png(graph):
+    """Renderiza el grafo a PNG con el binario `dot`; devuelve None si Graphviz no está instalado."""
+    try:
+        return graph.pipe(format="png")
+    except graphviz.ExecutableNotFound:
+        return None
+
+
+def arbol_master(motor=MOTOR):
+    """
+    Devuelve (dot, svg) del árbol master para la versión actual de la base de reglas.
+
+    Se construye y renderiza una sola vez por versión (hash de la base de reglas) y
+    proceso; `svg` es None si no hay binario `dot` y el navegador debe hacer el layout.
+    """
+    with _LOCK_ARBOLES:
+        if motor.version not in _ARBOLES_MASTER:
+            graph = construir_arbol_master(motor)
+            _ARBOLES_MASTER[motor.version] = (graph.source, renderizar_svg(graph))
+        return _ARBOLES_MASTER[motor.version]
+
+
+def renderizar_en_segundo_plano(graph):
+    """
+    Lanza el layout del grafo en un hilo aparte y devuelve un `Future` con el SVG
+    (o None sin binario `dot`). Grafos idénticos comparten el mismo `Future`.
+    """
+    clave = hashlib.sha256(graph.source.encode("utf-8")).hexdigest()
+    with _LOCK_LAYOUTS:
+        if clave in _LAYOUTS:
+            _LAYOUTS.move_to_end(clave)
+        else:
+            _LAYOUTS[clave] = _POOL_LAYOUT.submit(renderizar_svg, graph)
+            if len(_LAYOUTS) > _MAX_LAYOUTS:
+                _LAYOUTS.popitem(last=False)
+        return _LAYOUTS[clave]
+
+
+def construir_mapa_caso(valores, motor=MOTOR):
+    """Mapa conceptual de un caso único (dict parámetro -> valor de la Calculadora)."""
+    graph = graphviz.Digraph()
+    graph.attr(rankdir='TB')
+
+    # Nodo Central
+    graph.node('F1', 'FALLA POTENCIAL', shape='doubleoctagon', style='filled', fillcolor='#e0e0e0', fontsize='20')
+
+    for parametro, valor in valores.items():
+        # Recuperar reglas del diccionario global PARAMETROS
+        reglas = motor.parametros.get(parametro)
+
+        # Determinar estado y color
+        estado_texto = "Normal"
+        color_fondo = "#ccffcc" # Verde claro (Safe)
+
+        if reglas:
+            _, nivel = motor.clasificar(parametro, valor)
+            # Chequear Crítico Severo
+            if nivel == 2:
+                estado_texto = "CRÍTICO"
+                color_fondo = "#ffcccc" # Rojo claro
+            # Chequear Crítico Normal (Alerta)
+            elif nivel == 1:
+                estado_texto = "ALERTA"
+                color_fondo = "#fff4cc" # Amarillo claro
+
+        # Etiqueta del nodo
+        label_nodo = f"{parametro}\nVal: {valor}\n[{estado_texto}]"
+
+        # Crear nodo y arista
+        graph.node(parametro, label_nodo, shape='box', style='filled', fillcolor=color_fondo)
+
+        # Conexión directa a la Falla, indicando el mecanismo
+        mecanismo = reglas["mecanismo"] if reglas else "General"
+        graph.edge('F1', parametro, label=mecanismo)
+
+    return graph
+
+
+def _niveles_por_parametro(inventario, motor):
+    # Segmentos en Alerta y en Severo por parámetro, clasificando cada columna completa
+    from evaluacion import a_booleano, a_numerico
+
+    conteos = {}
+    for p, info in motor.parametros.items():
+        if p not in inventario.columns:
+            continue
+        columna = a_booleano(inventario[p]) if info["tipo"] == "bool" else a_numerico(inventario[p])
+        _, nivel = motor.clasificar_arreglo(p, columna)
+        conteos[p] = (int(np.count_nonzero(nivel == 1)), int(np.count_nonzero(nivel == 2)))
+    return conteos
+
+
+def construir_mapa_agregado(inventario, resultados, mecanismo_detalle=None, max_nodos=MAX_NODOS_MAPA, motor=MOTOR):
+    """
+    Mapa conceptual de un lote de segmentos (salida de `evaluar_lote`).
+
+    Cada mecanismo es un subgrafo (cluster) con sus parámetros activados y los
+    conteos de segmentos en Alerta/Severo. Los segmentos y parámetros en Normal
+    se resumen en un nodo con el conteo, y se dibujan como máximo `max_nodos`
+    nodos (salvo que el tope no alcance ni para la estructura fija: F1, un nodo
+    por mecanismo y sus notas de resumen). Con `mecanismo_detalle` se agregan los
+    segmentos más críticos de ese mecanismo unidos a sus drivers.
+    """
+    # evaluacion (y con él pandas) solo se carga para el mapa por lote
+    from evaluacion import COLUMNA_ACTIVO
+
+    graph = graphviz.Digraph()
+    graph.attr(rankdir='LR', compound='true')
+    graph.attr('node', style='filled', fontname="Helvetica")
+
+    graph.node('F1', f'FALLA POTENCIAL\n{len(resultados)} segmentos', shape='doubleoctagon', fillcolor='#e0e0e0', fontsize='18')
+    dibujados = set()
+
+    conteos = _niveles_por_parametro(inventario, motor)
+    activos = resultados[COLUMNA_ACTIVO].astype(str).to_numpy() if COLUMNA_ACTIVO in resultados.columns \
+        else resultados.index.astype(str).to_numpy()
+
+    # Primero se cuentan los nodos fijos (F1, mecanismos y notas de resumen); el resto
+    # del tope se reparte entre los parámetros activados y luego el drill-down
+    resumen = {}
+    fijos = 1
+    for m in motor.mecanismos:
+        severidad = resultados[f"{m}_severidad"].to_numpy()
+        n_severo = int(np.count_nonzero(severidad == 2))
+        n_alerta = int(np.count_nonzero(severidad == 1))
+        n_normal = len(severidad) - n_severo - n_alerta
+        en_alerta = [p for p in motor.por_mecanismo[m] if sum(conteos.get(p, (0, 0)))]
+        parametros_normales = len(motor.por_mecanismo[m]) - len(en_alerta)
+        resumen[m] = (n_severo, n_alerta, n_normal, en_alerta, parametros_normales)
+        fijos += 1 + bool(n_normal) + bool(parametros_normales)
+
+    criticos = None
+    if mecanismo_detalle is not None:
+        severidad = resultados[f"{mecanismo_detalle}_severidad"].to_numpy()
+        activados = resultados[f"{mecanismo_detalle}_activados"].to_numpy()
+        criticos = np.flatnonzero(severidad > 0)
+        # Orden: severidad y luego parámetros activados, de mayor a menor
+        criticos = criticos[np.lexsort((-activados[criticos], -severidad[criticos]))]
+
+    # Con drill-down queda un lugar reservado para al menos su primer nodo (o el "+N segmentos")
+    reserva = 1 if criticos is not None and len(criticos) else 0
+    cupo = max(0, max_nodos - fijos - reserva)
+
+    for m in motor.mecanismos:
+        n_severo, n_alerta, n_normal, en_alerta, parametros_normales = resumen[m]
+        peor = 2 if n_severo else 1 if n_alerta else 0
+        visibles = en_alerta[:cupo]
+        cupo -= len(visibles)
+        omitidos = len(en_alerta) - len(visibles)
+
+        with graph.subgraph(name=f"cluster_{m}") as cluster:
+            cluster.attr(label=m, style='rounded', color='#7f8c8d')
+            # Los parámetros que no entran en el tope se informan en el propio nodo del mecanismo
+            etiqueta = f"{m}\n{motor.nombres_mecanismos[m]}\n🔥 {n_severo} | ⚠️ {n_alerta}"
+            if omitidos:
+                etiqueta += f"\n+{omitidos} parámetros (tope de nodos)"
+            cluster.node(m, etiqueta, shape='ellipse', fillcolor=COLORES_NIVEL[peor], fontsize='12')
+            graph.edge('F1', m, penwidth='2')
+
+            # Segmentos en Normal: un solo nodo con el conteo
+            if n_normal:
+                cluster.node(f"{m}__normales", f"✅ {n_normal} segmentos\nen Normal", shape='note',
+                             fillcolor=COLORES_NIVEL[0], fontsize='9')
+                graph.edge(m, f"{m}__normales", style='dashed', color='#aaaaaa')
+
+            for p in visibles:
+                alerta, severo = conteos[p]
+                nivel = 2 if severo else 1
+                cluster.node(p, f"{p}\n🔥 {severo} | ⚠️ {alerta}", shape='box', fillcolor=COLORES_NIVEL[nivel], fontsize='10')
+                graph.edge(m, p)
+                dibujados.add(p)
+
+            if parametros_normales:
+                cluster.node(f"{m}__param_normales", f"{parametros_normales} parámetros\nsin activar", shape='note',
+                             fillcolor='white', color='#aaaaaa', fontsize='9')
+                graph.edge(m, f"{m}__param_normales", style='dashed', color='#aaaaaa')
+
+    # Drill-down: segmentos más críticos del mecanismo elegido
+    if criticos is not None:
+        severidad = resultados[f"{mecanismo_detalle}_severidad"].to_numpy()
+        drivers = resultados[f"{mecanismo_detalle}_drivers"].to_numpy()
+
+        cupo = min(MAX_SEGMENTOS_DETALLE, cupo + reserva)
+        if len(criticos) > cupo:
+            # El "+N segmentos" ocupa uno de los lugares
+            cupo = max(0, cupo - 1)
+
+        with graph.subgraph(name=f"cluster_{mecanismo_detalle}_segmentos") as cluster:
+            cluster.attr(label=f"Segmentos críticos — {mecanismo_detalle}", style='dashed', color='#c0392b')
+            for i in criticos[:cupo]:
+                nodo = f"seg__{i}"
+                cluster.node(nodo, f"{activos[i]}\n[{NIVELES[int(severidad[i])]}]", shape='box',
+                             fillcolor=COLORES_NIVEL[int(severidad[i])], fontsize='9')
+                for p in drivers[i].split(", "):
+                    if p in dibujados:
+                        graph.edge(p, nodo, color='#aaaaaa', arrowsize='0.5')
+            if len(criticos) > cupo:
+                cluster.node(f"{mecanismo_detalle}__mas_segmentos", f"+{len(criticos) - cupo} segmentos", shape='note',
+                             fillcolor='#eeeeee', fontsize='9')
+
+    return graph
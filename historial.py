@@ -0,0 +1,217 @@
+import json
+import os
+import sqlite3
+from contextlib import closing
+from datetime import datetime, timezone
+
+import pandas as pd
+
+from evaluacion import COLUMNA_ACTIVO, a_booleano, a_numerico
+from parametros import MECANISMOS, MOTOR, PARAMETROS
+
+# ==========================================================================================
+# HISTORIAL PERSISTENTE DE EVALUACIONES (SQLITE)
+# ==========================================================================================
+
+RUTA_HISTORIAL = os.environ.get(
+    "SIMEF_HISTORIAL", os.path.join(os.path.dirname(os.path.abspath(__file__)), "historial.sqlite")
+)
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS corridas (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    fecha TEXT NOT NULL,
+    origen TEXT NOT NULL,
+    version_reglas TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS resultados (
+    corrida_id INTEGER NOT NULL REFERENCES corridas(id),
+    activo TEXT NOT NULL,
+    fecha TEXT NOT NULL,
+    mecanismo TEXT NOT NULL,
+    severidad INTEGER NOT NULL,
+    activados INTEGER NOT NULL,
+    drivers TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS entradas (
+    corrida_id INTEGER NOT NULL REFERENCES corridas(id),
+    activo TEXT NOT NULL,
+    valores TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_resultados_activo ON resultados (activo, fecha);
+CREATE INDEX IF NOT EXISTS idx_resultados_mecanismo ON resultados (mecanismo, severidad, fecha);
+CREATE INDEX IF NOT EXISTS idx_resultados_severidad ON resultados (severidad, fecha);
+CREATE INDEX IF NOT EXISTS idx_entradas_activo ON entradas (corrida_id, activo);
+"""
+
+
+def _ahora():
+    return datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+
+def _texto_fecha(fecha):
+    if fecha is None:
+        return None
+    if isinstance(fecha, str):
+        return fecha
+    return pd.Timestamp(fecha).isoformat()
+
+
+class Historial:
+    """
+    Almacén local de corridas de evaluación.
+
+    Cada corrida guarda las entradas y, por segmento y mecanismo, la severidad,
+    los parámetros activados y los drivers. Las corridas nuevas solo agregan filas;
+    nunca se reescribe lo ya guardado. Cada operación abre su propia conexión, así
+    que una misma instancia se puede compartir entre sesiones de Streamlit.
+    """
+
+    def __init__(self, ruta=RUTA_HISTORIAL):
+        self.ruta = ruta
+        with closing(self._conectar()) as con:
+            # WAL permite consultar mientras otra corrida se está escribiendo
+            con.execute("PRAGMA journal_mode=WAL")
+            con.executescript(ESQUEMA)
+
+    def _conectar(self):
+        con = sqlite3.connect(self.ruta, timeout=30)
+        con.execute("PRAGMA synchronous=NORMAL")
+        return con
+
+    def iniciar_corrida(self, origen, fecha=None):
+        """Crea una corrida vacía y devuelve su id."""
+        with closing(self._conectar()) as con, con:
+            cursor = con.execute(
+                "INSERT INTO corridas (fecha, origen, version_reglas) VALUES (?, ?, ?)",
+                (_texto_fecha(fecha) or _ahora(), origen, MOTOR.version),
+            )
+            return cursor.lastrowid
+
+    def fecha_corrida(self, corrida_id):
+        with closing(self._conectar()) as con:
+            (fecha,) = con.execute("SELECT fecha FROM corridas WHERE id = ?", (corrida_id,)).fetchone()
+        return fecha
+
+    def insertar_filas(self, filas_resultados, filas_entradas):
+        """Inserta filas ya armadas con `filas_historial` (solo el trabajo de SQLite)."""
+        with closing(self._conectar()) as con, con:
+            con.executemany(
+                "INSERT INTO resultados (corrida_id, activo, fecha, mecanismo, severidad, activados, drivers) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                filas_resultados,
+            )
+            con.executemany("INSERT INTO entradas (corrida_id, activo, valores) VALUES (?, ?, ?)", filas_entradas)
+
+    def agregar_resultados(self, corrida_id, inventario, resultados):
+        """Agrega a la corrida un bloque de entradas y sus resultados (salida de `evaluar_lote`)."""
+        fecha = self.fecha_corrida(corrida_id)
+        self.insertar_filas(*filas_historial(corrida_id, fecha, inventario, resultados))
+
+    def registrar_corrida(self, inventario, resultados, origen, fecha=None):
+        """Guarda una corrida completa en una sola llamada y devuelve su id."""
+        corrida_id = self.iniciar_corrida(origen, fecha)
+        self.agregar_resultados(corrida_id, inventario, resultados)
+        return corrida_id
+
+    def consultar(self, mecanismo=None, severidad_min=None, activo=None, desde=None, hasta=None, limite=None):
+        """
+        Devuelve los resultados guardados que cumplen los filtros, p. ej. todos los
+        segmentos severos en M4 del último trimestre:
+        `consultar("M4", severidad_min=2, desde=hace_90_dias)`.
+        """
+        condiciones, argumentos = [], []
+        if mecanismo is not None:
+            condiciones.append("mecanismo = ?")
+            argumentos.append(mecanismo)
+        if severidad_min is not None:
+            condiciones.append("severidad >= ?")
+            argumentos.append(int(severidad_min))
+        if activo is not None:
+            condiciones.append("activo = ?")
+            argumentos.append(str(activo))
+        if desde is not None:
+            condiciones.append("fecha >= ?")
+            argumentos.append(_texto_fecha(desde))
+        if hasta is not None:
+            condiciones.append("fecha <= ?")
+            argumentos.append(_texto_fecha(hasta))
+
+        consulta = "SELECT corrida_id, activo, fecha, mecanismo, severidad, activados, drivers FROM resultados"
+        if condiciones:
+            consulta += " WHERE " + " AND ".join(condiciones)
+        consulta += " ORDER BY fecha DESC"
+        if limite is not None:
+            consulta += f" LIMIT {int(limite)}"
+
+        with closing(self._conectar()) as con:
+            return pd.read_sql_query(consulta, con, params=argumentos)
+
+    def corridas(self):
+        with closing(self._conectar()) as con:
+            return pd.read_sql_query("SELECT id, fecha, origen, version_reglas FROM corridas ORDER BY fecha DESC", con)
+
+    def entradas(self, corrida_id, activo=None):
+        """Devuelve las entradas de una corrida como tabla (una fila por segmento)."""
+        consulta = "SELECT activo, valores FROM entradas WHERE corrida_id = ?"
+        argumentos = [corrida_id]
+        if activo is not None:
+            consulta += " AND activo = ?"
+            argumentos.append(str(activo))
+        with closing(self._conectar()) as con:
+            filas = con.execute(consulta, argumentos).fetchall()
+        return pd.DataFrame([{COLUMNA_ACTIVO: a, **json.loads(v)} for a, v in filas])
+
+
+def filas_historial(corrida_id, fecha, inventario, resultados):
+    """
+    Filas de `resultados` y `entradas` para un bloque, listas para `Historial.insertar_filas`.
+
+    No toca la base: la CLI las arma en los procesos del pool y el proceso principal
+    solo ejecuta los INSERT.
+    """
+    activos = _identificadores(inventario)
+
+    filas_resultados = []
+    for m in MECANISMOS:
+        filas_resultados.extend(zip(
+            (corrida_id for _ in activos), activos, (fecha for _ in activos), (m for _ in activos),
+            resultados[f"{m}_severidad"].astype(int).tolist(),
+            resultados[f"{m}_activados"].astype(int).tolist(),
+            resultados[f"{m}_drivers"].tolist(),
+        ))
+
+    # Entradas: un JSON por segmento con los parámetros informados. Las celdas vacías
+    # quedan fuera (a_booleano las convierte en False y no deben guardarse como tal)
+    columnas = {}
+    for p, info in PARAMETROS.items():
+        if p not in inventario.columns:
+            continue
+        if info["tipo"] == "bool":
+            valores = a_booleano(inventario[p]).astype(object)
+        else:
+            valores = a_numerico(inventario[p]).astype(object)
+        valores[_vacias(inventario[p])] = None
+        columnas[p] = valores.tolist()
+    filas = (
+        {p: v for p, v in zip(columnas, valores) if v is not None and v == v}
+        for valores in zip(*columnas.values())
+    ) if columnas else ({} for _ in activos)
+    filas_entradas = [(corrida_id, a, json.dumps(v)) for a, v in zip(activos, filas)]
+
+    return filas_resultados, filas_entradas
+
+
+def _vacias(serie):
+    # Celdas sin dato: nulos y textos en blanco (planillas con celdas vacías como "")
+    vacias = serie.isna()
+    if serie.dtype == object or isinstance(serie.dtype, pd.StringDtype):
+        vacias |= serie.astype("string").str.strip().eq("").fillna(True)
+    return vacias.to_numpy(dtype=bool)
+
+
+def _identificadores(inventario):
+    # Sin columna `activo` se usa el número de fila como identificador del segmento
+    if COLUMNA_ACTIVO in inventario.columns:
+        return inventario[COLUMNA_ACTIVO].astype(str).tolist()
+    return [str(i) for i in inventario.index]
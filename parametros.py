@@ -0,0 +1,17 @@
+import os
+
+from reglas import cargar_reglas, compilar
+
+# ==========================================================================================
+# BASE COMPLETA DE PARÁMETROS
+# ==========================================================================================
+
+# La base de reglas se lee de reglas.yaml (o del archivo indicado en SIMEF_REGLAS)
+# y se compila una sola vez al importar el módulo.
+RUTA_REGLAS = os.environ.get("SIMEF_REGLAS", os.path.join(os.path.dirname(os.path.abspath(__file__)), "reglas.yaml"))
+
+MOTOR = compilar(cargar_reglas(RUTA_REGLAS))
+
+PARAMETROS = MOTOR.parametros
+MECANISMOS = MOTOR.mecanismos
+NOMBRES_MECANISMOS = MOTOR.nombres_mecanismos
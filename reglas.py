@@ -0,0 +1,189 @@
+import bisect
+import hashlib
+import json
+from dataclasses import dataclass
+
+import numpy as np
+
+# ==========================================================================================
+# MODELO DECLARATIVO DE REGLAS
+# ==========================================================================================
+
+NIVELES = {0: "Normal", 1: "Alerta", 2: "Severo"}
+
+SIMBOLOS = {">=": "≥", ">": ">", "<=": "≤", "<": "<", "==": "="}
+
+# Orientación de cada operador: (signo, incluye el umbral).
+# Los umbrales se guardan multiplicados por el signo, así "v <= t" pasa a ser "-v >= -t"
+# y todos los parámetros se clasifican con la misma búsqueda binaria ascendente.
+_ORIENTACION = {">=": (1.0, True), ">": (1.0, False), "<=": (-1.0, True), "<": (-1.0, False), "==": (1.0, True)}
+
+
+@dataclass(frozen=True)
+class Regla:
+    operador: str
+    umbral: float
+    nivel: int
+
+    def describir(self, unidad=""):
+        if self.operador == "==":
+            return "= TRUE"
+        sufijo = f" {unidad}" if unidad else ""
+        return f"{SIMBOLOS[self.operador]} {self.umbral:g}{sufijo}"
+
+
+def cargar_reglas(ruta):
+    """Lee la base de reglas desde un archivo YAML o JSON."""
+    with open(ruta, encoding="utf-8") as f:
+        if str(ruta).lower().endswith(".json"):
+            return json.load(f)
+        try:
+            import yaml
+        except ImportError as exc:
+            raise ImportError("Se necesita PyYAML para leer reglas en YAML (pip install pyyaml).") from exc
+        return yaml.safe_load(f)
+
+
+def compilar(base):
+    """Valida la base de reglas y la compila en un `MotorReglas`."""
+    return MotorReglas(base)
+
+
+class MotorReglas:
+    """
+    Base de reglas compilada.
+
+    Por cada parámetro se guarda un arreglo ordenado de umbrales (agrupados por
+    mecanismo en `por_mecanismo`) y el nivel alcanzado tras cruzar k umbrales, de
+    modo que un valor se clasifica con una sola búsqueda binaria.
+    """
+
+    def __init__(self, base):
+        self.version = hashlib.sha256(
+            json.dumps(base, sort_keys=True, ensure_ascii=False).encode("utf-8")
+        ).hexdigest()[:12]
+
+        self.nombres_mecanismos = dict(base.get("mecanismos", {}))
+        self.parametros = {}
+        self.por_mecanismo = {m: [] for m in self.nombres_mecanismos}
+
+        self._umbrales = {}
+        self._umbrales_np = {}
+        self._niveles = {}
+        self._niveles_np = {}
+        self._siguiente_np = {}
+        self._signo = {}
+        self._inclusivo = {}
+
+        for p, datos in base["parametros"].items():
+            mec = datos["mecanismo"]
+            tipo = datos["tipo"]
+            if tipo not in ("num", "bool"):
+                raise ValueError(f"{p}: tipo desconocido '{tipo}'")
+
+            reglas = [Regla(r["operador"], r["umbral"], int(r["nivel"])) for r in datos["reglas"]]
+            if not reglas:
+                raise ValueError(f"{p}: el parámetro no tiene reglas")
+            operadores = {r.operador for r in reglas}
+            if len(operadores) != 1:
+                raise ValueError(f"{p}: todas las reglas de un parámetro deben usar el mismo operador")
+            operador = operadores.pop()
+            if operador not in _ORIENTACION:
+                raise ValueError(f"{p}: operador desconocido '{operador}'")
+            if (operador == "==") != (tipo == "bool"):
+                raise ValueError(f"{p}: el operador '==' es exclusivo de parámetros booleanos")
+            # Un booleano solo se activa cuando es verdadero: "== false" valdría también
+            # para las celdas vacías, que cuentan como parámetro no ingresado
+            if operador == "==" and any(r.umbral is not True for r in reglas):
+                raise ValueError(f"{p}: las reglas '==' solo admiten umbral: true")
+            if any(r.nivel not in NIVELES or r.nivel == 0 for r in reglas):
+                raise ValueError(f"{p}: los niveles válidos son 1 (Alerta) y 2 (Severo)")
+
+            signo, inclusivo = _ORIENTACION[operador]
+            ordenadas = sorted(reglas, key=lambda r: signo * float(r.umbral))
+            umbrales = [signo * float(r.umbral) for r in ordenadas]
+
+            # Nivel tras cruzar k umbrales = máximo nivel de las k primeras reglas
+            niveles = [0]
+            for r in ordenadas:
+                niveles.append(max(niveles[-1], r.nivel))
+
+            self.parametros[p] = {
+                "mecanismo": mec,
+                "tipo": tipo,
+                "nombre": datos.get("nombre", p),
+                "unidad": datos.get("unidad", ""),
+                "obs": datos.get("obs", ""),
+                "reglas": tuple(reglas),
+            }
+            self.por_mecanismo.setdefault(mec, []).append(p)
+            self.nombres_mecanismos.setdefault(mec, mec)
+
+            self._umbrales[p] = umbrales
+            self._umbrales_np[p] = np.array(umbrales, dtype=float)
+            self._niveles[p] = tuple(niveles)
+            self._niveles_np[p] = np.array(niveles, dtype=np.int64)
+            # Tras cruzar k umbrales, índice del próximo umbral que sube el nivel (-1 si no hay)
+            siguiente = []
+            for k in range(len(niveles)):
+                j = next((j for j in range(k + 1, len(niveles)) if niveles[j] > niveles[k]), 0)
+                siguiente.append(j - 1)
+            self._siguiente_np[p] = np.array(siguiente, dtype=np.int64)
+            self._signo[p] = signo
+            self._inclusivo[p] = inclusivo
+
+        self.mecanismos = list(self.por_mecanismo)
+
+    def clasificar(self, parametro, valor):
+        """Devuelve (reglas cumplidas, nivel) para un valor escalar."""
+        if self.parametros[parametro]["tipo"] == "bool":
+            x = 1.0 if valor is True else 0.0
+        else:
+            x = float(valor)
+            if x != x:  # NaN: parámetro sin dato
+                return 0, 0
+        x *= self._signo[parametro]
+        umbrales = self._umbrales[parametro]
+        if self._inclusivo[parametro]:
+            k = bisect.bisect_right(umbrales, x)
+        else:
+            k = bisect.bisect_left(umbrales, x)
+        return k, self._niveles[parametro][k]
+
+    def clasificar_arreglo(self, parametro, valores):
+        """Versión vectorizada de `clasificar`; los NaN cuentan como parámetro sin dato."""
+        x = np.asarray(valores, dtype=float) * self._signo[parametro]
+        lado = "right" if self._inclusivo[parametro] else "left"
+        k = np.searchsorted(self._umbrales_np[parametro], x, side=lado)
+        k[np.isnan(x)] = 0
+        return k, self._niveles_np[parametro][k]
+
+    def margen_arreglo(self, parametro, valores):
+        """
+        Distancia de cada valor al próximo umbral que lo llevaría a un nivel más alto.
+
+        Devuelve (umbral, nivel, distancia): el umbral en unidades del parámetro, el
+        nivel que se alcanzaría al cruzarlo y la distancia (≥ 0) hasta él. Los valores
+        sin dato o que ya están en el nivel máximo quedan con distancia infinita.
+        """
+        signo = self._signo[parametro]
+        x = np.asarray(valores, dtype=float) * signo
+        k, _ = self.clasificar_arreglo(parametro, valores)
+        indice = self._siguiente_np[parametro][k]
+        umbral = self._umbrales_np[parametro][np.maximum(indice, 0)]
+        distancia = np.where((indice >= 0) & ~np.isnan(x), umbral - x, np.inf)
+        nivel = self._niveles_np[parametro][np.maximum(indice, 0) + 1]
+        return umbral * signo, nivel, np.maximum(distancia, 0.0)
+
+    def criterio_texto(self, parametro):
+        info = self.parametros[parametro]
+        partes = []
+        for r in sorted(info["reglas"], key=lambda r: r.nivel):
+            partes.append(f"{r.describir(info['unidad'])} → {NIVELES[r.nivel].lower()}")
+        return "; ".join(partes)
+
+    def tipo_texto(self, parametro):
+        info = self.parametros[parametro]
+        if info["tipo"] == "bool":
+            return "boolean"
+        return f"numérico ({info['unidad']})" if info["unidad"] else "numérico"
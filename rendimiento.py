@@ -0,0 +1,104 @@
+import json
+import math
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+# ==========================================================================================
+# INSTRUMENTACIÓN DE ETAPAS (TIEMPOS POR SESIÓN Y AGREGADOS)
+# ==========================================================================================
+
+# Muestras que se conservan por etapa (las más recientes)
+MAX_MUESTRAS = 2000
+
+# Si está definida, cada medición se agrega como una línea JSON a este archivo
+RUTA_METRICAS = os.environ.get("SIMEF_METRICAS")
+
+
+def percentil(ordenadas, q):
+    """Percentil `q` (0-100) por rango más cercano sobre una lista ya ordenada."""
+    if not ordenadas:
+        return 0.0
+    indice = max(0, min(len(ordenadas) - 1, math.ceil(q / 100 * len(ordenadas)) - 1))
+    return ordenadas[indice]
+
+
+def estadisticas(muestras):
+    ordenadas = sorted(muestras)
+    return {
+        "n": len(ordenadas),
+        "media_ms": sum(ordenadas) / len(ordenadas) if ordenadas else 0.0,
+        "p50_ms": percentil(ordenadas, 50),
+        "p95_ms": percentil(ordenadas, 95),
+        "p99_ms": percentil(ordenadas, 99),
+        "max_ms": ordenadas[-1] if ordenadas else 0.0,
+    }
+
+
+class Metricas:
+    """Registro de duraciones por etapa, compartido por todas las sesiones del proceso."""
+
+    def __init__(self, max_muestras=MAX_MUESTRAS, ruta_log=RUTA_METRICAS):
+        self.max_muestras = max_muestras
+        self.ruta_log = ruta_log
+        self._muestras = defaultdict(lambda: deque(maxlen=self.max_muestras))
+        self._lock = threading.Lock()
+
+    def registrar(self, etapa, ms, sesion=None):
+        with self._lock:
+            self._muestras[etapa].append(ms)
+            if self.ruta_log:
+                with open(self.ruta_log, "a", encoding="utf-8") as f:
+                    f.write(json.dumps({
+                        "fecha": datetime.now(timezone.utc).isoformat(timespec="milliseconds"),
+                        "sesion": sesion,
+                        "etapa": etapa,
+                        "ms": round(ms, 3),
+                    }) + "\n")
+
+    def resumen(self):
+        with self._lock:
+            copia = {etapa: list(muestras) for etapa, muestras in self._muestras.items()}
+        return {etapa: estadisticas(muestras) for etapa, muestras in sorted(copia.items())}
+
+    def exportar(self, muestras_sesion=None):
+        """Métricas en formato JSON: agregado del proceso y, si se pasa, de una sesión."""
+        datos = {
+            "fecha": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "agregado": self.resumen(),
+        }
+        if muestras_sesion is not None:
+            datos["sesion"] = {etapa: estadisticas(m) for etapa, m in sorted(muestras_sesion.items())}
+        return json.dumps(datos, indent=2, ensure_ascii=False)
+
+
+METRICAS = Metricas()
+
+
+@contextmanager
+def medir(etapa, muestras_sesion=None, sesion=None, metricas=METRICAS):
+    """
+    Mide la duración del bloque y la registra en `metricas` y, si se pasa, en el
+    dict `muestras_sesion` (etapa -> deque de ms) de la sesión actual.
+    """
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        ms = (time.perf_counter() - inicio) * 1000
+        metricas.registrar(etapa, ms, sesion)
+        if muestras_sesion is not None:
+            if etapa not in muestras_sesion:
+                muestras_sesion[etapa] = deque(maxlen=metricas.max_muestras)
+            muestras_sesion[etapa].append(ms)
+
+
+def procesos_disponibles():
+    """CPUs que puede usar este proceso (para dimensionar los pools de la CLI y los reportes)."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
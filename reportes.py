@@ -0,0 +1,384 @@
+import hashlib
+import io
+import multiprocessing
+import os
+import re
+import shutil
+import sys
+import tempfile
+import types
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
+
+import numpy as np
+from fpdf import FPDF
+
+from evaluacion import COLUMNA_ACTIVO, VALORES_VERDADEROS
+from graficos import COLORES_SEVERIDAD
+from grafos import COLORES_NIVEL, construir_arbol_master, construir_mapa_caso, renderizar_png
+from parametros import MECANISMOS, MOTOR, NOMBRES_MECANISMOS
+from reglas import NIVELES
+from rendimiento import procesos_disponibles
+
+# ==========================================================================================
+# REPORTES PDF POR ACTIVO (CASO ÚNICO Y CAMPAÑAS COMPLETAS)
+# ==========================================================================================
+#
+# Un PDF por segmento con severidades, drivers, gráficos, parámetros y mapa conceptual.
+# Los gráficos de barras se dibujan como vectores de fpdf (matplotlib tarda ~100 ms por
+# gráfico y en una campaña casi todos los vectores de activados son distintos). Las
+# imágenes (árbol master, mapas) se escriben una sola vez a disco como JPEG: fpdf 1.7
+# decodifica en Python puro el canal alfa de los PNG, lo que es muy lento. El árbol
+# master se renderiza una vez por versión de la base de reglas y proceso. Las campañas
+# se reparten por bloques en un pool de procesos con pocos bloques en vuelo.
+
+# Segmentos por tarea del pool
+TAMANO_BLOQUE_REPORTES = 100
+
+# Ancho útil de una página A4 con márgenes de 10 mm
+ANCHO_UTIL = 190
+
+# PNG del árbol master por versión de la base de reglas (None si no hay binario `dot`)
+_PNG_MASTER = {}
+
+# Colores de matplotlib usados por los gráficos de la Calculadora, en RGB
+_COLORES_RGB = {"skyblue": (135, 206, 235), "green": (0, 128, 0), "orange": (255, 165, 0), "red": (255, 0, 0)}
+
+_REEMPLAZOS = {"\n": " ", "≥": ">=", "≤": "<=", "→": "->", "—": "-", "–": "-", "·": "-", "…": "...", "₂": "2", "φ": "phi"}
+
+
+def _texto(valor):
+    # Las fuentes estándar de fpdf 1.7 solo cubren latin-1; un salto de línea dentro de
+    # una celda quedaría crudo en el PDF (p. ej. "Corrosión General\n(Química)")
+    texto = str(valor)
+    for original, reemplazo in _REEMPLAZOS.items():
+        texto = texto.replace(original, reemplazo)
+    return texto.encode("latin-1", "replace").decode("latin-1")
+
+
+def _rgb(color_hex):
+    color_hex = color_hex.lstrip("#")
+    return tuple(int(color_hex[i:i + 2], 16) for i in (0, 2, 4))
+
+
+def _imagen_en_disco(png, directorio):
+    """Escribe el PNG como JPEG en `directorio` (una vez por contenido) y devuelve su ruta."""
+    ruta = os.path.join(directorio, f"{hashlib.sha1(png).hexdigest()}.jpg")
+    if not os.path.exists(ruta):
+        from PIL import Image
+
+        imagen = Image.open(io.BytesIO(png))
+        if imagen.mode in ("RGBA", "LA", "P"):
+            fondo = Image.new("RGB", imagen.size, "white")
+            imagen = imagen.convert("RGBA")
+            fondo.paste(imagen, mask=imagen.split()[-1])
+            imagen = fondo
+        # Se escribe con un nombre único y se renombra: varios procesos o hilos pueden
+        # generar la misma imagen a la vez
+        descriptor, temporal = tempfile.mkstemp(suffix=".jpg", dir=directorio)
+        try:
+            with os.fdopen(descriptor, "wb") as f:
+                imagen.convert("RGB").save(f, format="JPEG", quality=90)
+            os.replace(temporal, ruta)
+        except BaseException:
+            if os.path.exists(temporal):
+                os.remove(temporal)
+            raise
+    return ruta
+
+
+def valores_fila(fila, motor=MOTOR):
+    """Fila de un inventario como dict parámetro -> valor, igual que en la Calculadora."""
+    valores = {}
+    for p, info in motor.parametros.items():
+        v = fila.get(p)
+        if v is None or v != v or v == "":
+            continue
+        if info["tipo"] == "bool":
+            if isinstance(v, (bool, np.bool_)):
+                valores[p] = bool(v)
+            else:
+                valores[p] = str(v).strip().lower() in VALORES_VERDADEROS
+        else:
+            try:
+                valores[p] = float(v)
+            except (TypeError, ValueError):
+                continue
+    return valores
+
+
+def _grafico_barras(pdf, x, y, ancho, alto, titulo, etiquetas, valores, colores):
+    """Gráfico de barras vectorial, equivalente a los de `graficos` para la Calculadora."""
+    pdf.set_font("Arial", "B", 9)
+    pdf.set_xy(x, y)
+    pdf.cell(ancho, 5, _texto(titulo), 0, 0, "C")
+
+    # Área de dibujo: eje y con marcas enteras a la izquierda, etiquetas debajo
+    x0, y0, ancho_ejes, alto_ejes = x + 8, y + 7, ancho - 10, alto - 14
+    maximo = max(max(valores, default=0), 1)
+    pdf.set_draw_color(0, 0, 0)
+    pdf.set_font("Arial", "", 6)
+    paso = max(1, -(-maximo // 5))
+    for marca in range(0, maximo + 1, paso):
+        ym = y0 + alto_ejes - alto_ejes * marca / maximo
+        pdf.line(x0 - 1, ym, x0, ym)
+        pdf.set_xy(x0 - 8, ym - 1.5)
+        pdf.cell(6.5, 3, str(marca), 0, 0, "R")
+    pdf.line(x0, y0, x0, y0 + alto_ejes)
+    pdf.line(x0, y0 + alto_ejes, x0 + ancho_ejes, y0 + alto_ejes)
+
+    hueco = ancho_ejes / max(len(valores), 1)
+    for i, (etiqueta, valor, color) in enumerate(zip(etiquetas, valores, colores)):
+        xb = x0 + hueco * i + hueco * 0.1
+        if valor:
+            pdf.set_fill_color(*_COLORES_RGB[color])
+            pdf.rect(xb, y0 + alto_ejes - alto_ejes * valor / maximo, hueco * 0.8, alto_ejes * valor / maximo, "F")
+        pdf.set_xy(xb, y0 + alto_ejes + 0.5)
+        pdf.cell(hueco * 0.8, 3, etiqueta, 0, 0, "C")
+
+
+def _resultado_fila(fila):
+    activados = {m: int(fila[f"{m}_activados"]) for m in MECANISMOS}
+    severidad = {m: int(fila[f"{m}_severidad"]) for m in MECANISMOS}
+    drivers = {m: [d for d in str(fila[f"{m}_drivers"] or "").split(", ") if d] for m in MECANISMOS}
+    return activados, severidad, drivers
+
+
+class _Documento(FPDF):
+    def __init__(self, activo):
+        super().__init__(orientation="P", unit="mm", format="A4")
+        self.activo = activo
+        self.set_margins(10, 10, 10)
+        self.set_auto_page_break(True, margin=15)
+        self.alias_nb_pages()
+
+    def header(self):
+        self.set_font("Arial", "B", 9)
+        self.set_text_color(120, 120, 120)
+        self.cell(0, 6, _texto(f"Análisis de Mecanismos de Falla - {self.activo}"), 0, 1, "R")
+        self.set_text_color(0, 0, 0)
+
+    def footer(self):
+        self.set_y(-12)
+        self.set_font("Arial", "", 8)
+        self.set_text_color(120, 120, 120)
+        self.cell(0, 6, _texto(f"Base de reglas {MOTOR.version} - página {self.page_no()}/{{nb}}"), 0, 0, "C")
+
+    def titulo(self, texto, tamano=12):
+        self.set_font("Arial", "B", tamano)
+        self.cell(0, 8, _texto(texto), 0, 1)
+        self.set_font("Arial", "", 9)
+
+
+def _documento(activo, valores, activados, severidad, drivers, directorio_imagenes, ruta_master=None, con_mapa=True):
+    pdf = _Documento(activo)
+    pdf.add_page()
+
+    pdf.titulo(f"Reporte de mecanismos de falla: {activo}", 15)
+    pdf.cell(0, 6, _texto(f"Generado el {datetime.now():%Y-%m-%d %H:%M}"), 0, 1)
+    pdf.ln(2)
+
+    # Severidad por mecanismo
+    pdf.titulo("Resultados por mecanismo")
+    anchos = (18, 112, 25, 35)
+    pdf.set_font("Arial", "B", 9)
+    for ancho, encabezado in zip(anchos, ("Mecanismo", "Nombre", "Activados", "Severidad")):
+        pdf.cell(ancho, 7, _texto(encabezado), 1, 0, "C")
+    pdf.ln()
+    pdf.set_font("Arial", "", 9)
+    for m in MECANISMOS:
+        pdf.cell(anchos[0], 6, m, 1, 0, "C")
+        pdf.cell(anchos[1], 6, _texto(NOMBRES_MECANISMOS.get(m, m)), 1)
+        pdf.cell(anchos[2], 6, str(activados[m]), 1, 0, "C")
+        pdf.set_fill_color(*_rgb(COLORES_NIVEL[severidad[m]]))
+        pdf.cell(anchos[3], 6, NIVELES[severidad[m]], 1, 1, "C", fill=True)
+    pdf.ln(3)
+
+    pdf.titulo("Drivers activados")
+    con_drivers = [m for m in MECANISMOS if drivers[m]]
+    if not con_drivers:
+        pdf.cell(0, 6, _texto("Ningún parámetro supera sus criterios."), 0, 1)
+    for m in con_drivers:
+        nombres = ", ".join(MOTOR.parametros[p]["nombre"] for p in drivers[m])
+        pdf.multi_cell(0, 5, _texto(f"{m} ({NIVELES[severidad[m]]}): {nombres}"))
+    pdf.ln(3)
+
+    # Gráficos (mismo contenido que los de la Calculadora)
+    y = pdf.get_y()
+    if y > 220:
+        pdf.add_page()
+        y = pdf.get_y()
+    mitad = ANCHO_UTIL / 2 - 2
+    _grafico_barras(pdf, 10, y, mitad, 60, "Parámetros Activados", MECANISMOS,
+                    [activados[m] for m in MECANISMOS], ["skyblue"] * len(MECANISMOS))
+    _grafico_barras(pdf, 10 + mitad + 4, y, mitad, 60, "Nivel de Severidad", MECANISMOS,
+                    [severidad[m] for m in MECANISMOS], [COLORES_SEVERIDAD[severidad[m]] for m in MECANISMOS])
+    pdf.set_xy(10, y + 62)
+
+    # Parámetros ingresados
+    pdf.add_page()
+    pdf.titulo("Parámetros evaluados")
+    anchos = (90, 30, 25, 20, 25)
+    pdf.set_font("Arial", "B", 9)
+    for ancho, encabezado in zip(anchos, ("Parámetro", "Valor", "Unidad", "Mecanismo", "Nivel")):
+        pdf.cell(ancho, 7, _texto(encabezado), 1, 0, "C")
+    pdf.ln()
+    pdf.set_font("Arial", "", 8)
+    for p, v in valores.items():
+        info = MOTOR.parametros[p]
+        _, nivel = MOTOR.clasificar(p, v)
+        pdf.cell(anchos[0], 6, _texto(info["nombre"])[:60], 1)
+        pdf.cell(anchos[1], 6, _texto("Sí" if v is True else "No" if v is False else f"{v:g}"), 1, 0, "R")
+        pdf.cell(anchos[2], 6, _texto(info.get("unidad") or ""), 1, 0, "C")
+        pdf.cell(anchos[3], 6, info["mecanismo"], 1, 0, "C")
+        pdf.set_fill_color(*_rgb(COLORES_NIVEL[nivel]))
+        pdf.cell(anchos[4], 6, NIVELES[nivel], 1, 1, "C", fill=True)
+    if not valores:
+        pdf.cell(0, 6, _texto("Sin parámetros ingresados."), 0, 1)
+
+    # Mapa conceptual del caso (requiere el binario `dot`)
+    if con_mapa and valores:
+        png_mapa = renderizar_png(construir_mapa_caso(valores))
+        if png_mapa:
+            pdf.ln(4)
+            pdf.titulo("Mapa conceptual")
+            pdf.image(_imagen_en_disco(png_mapa, directorio_imagenes), x=10, w=ANCHO_UTIL)
+
+    # Árbol master (misma imagen para todos los reportes de la campaña)
+    if ruta_master:
+        pdf.add_page()
+        pdf.titulo("Árbol de fallas (master)")
+        pdf.image(ruta_master, x=10, w=ANCHO_UTIL)
+
+    return pdf
+
+
+def reporte_pdf(activo, valores, activados, severidad, drivers, con_master=True):
+    """PDF (bytes) de un caso único con los resultados de `evaluar_valores`."""
+    with tempfile.TemporaryDirectory(prefix="simef_imagenes_") as directorio:
+        ruta_master = imagen_master(directorio) if con_master else None
+        pdf = _documento(activo, valores, activados, severidad, drivers, directorio, ruta_master)
+        return pdf.output(dest="S").encode("latin-1")
+
+
+def imagen_master(directorio, motor=MOTOR):
+    """Ruta del JPEG del árbol master en `directorio`; None si Graphviz no está instalado."""
+    if motor.version not in _PNG_MASTER:
+        _PNG_MASTER[motor.version] = renderizar_png(construir_arbol_master(motor))
+    png = _PNG_MASTER[motor.version]
+    return _imagen_en_disco(png, directorio) if png else None
+
+
+def nombres_archivo(identificadores, vistos=None):
+    """
+    Nombres de archivo seguros y únicos (se numeran los activos repetidos). Pasando el
+    mismo dict `vistos` en cada bloque, los nombres son únicos en toda la campaña.
+    """
+    nombres, vistos = [], {} if vistos is None else vistos
+    for activo in identificadores:
+        base = re.sub(r"[^\w.-]+", "_", str(activo)).strip("._") or "segmento"
+        vistos[base] = vistos.get(base, 0) + 1
+        nombres.append(f"{base}.pdf" if vistos[base] == 1 else f"{base}_{vistos[base]}.pdf")
+    return nombres
+
+
+def identificadores(inventario):
+    if COLUMNA_ACTIVO in inventario.columns:
+        return inventario[COLUMNA_ACTIVO].tolist()
+    return [f"segmento_{i}" for i in inventario.index]
+
+
+def escribir_reportes(inventario, resultados, nombres, directorio, directorio_imagenes, ruta_master=None, con_mapa=True):
+    """Escribe en `directorio` el PDF de cada fila de un bloque (se ejecuta en los procesos del pool)."""
+    for (_, fila), (_, resultado), nombre in zip(inventario.iterrows(), resultados.iterrows(), nombres):
+        activo = fila.get(COLUMNA_ACTIVO, nombre[:-4])
+        activados, severidad, drivers = _resultado_fila(resultado)
+        pdf = _documento(activo, valores_fila(fila), activados, severidad, drivers,
+                         directorio_imagenes, ruta_master, con_mapa)
+        pdf.output(os.path.join(directorio, nombre), "F")
+    return len(nombres)
+
+
+def _contexto_procesos():
+    # Desde el servidor de Streamlit (con varios hilos) un fork puede quedar bloqueado en
+    # un lock tomado por otro hilo: los procesos salen de un forkserver (spawn en Windows),
+    # que ya tiene cargado este módulo
+    if "forkserver" not in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("spawn")
+    contexto = multiprocessing.get_context("forkserver")
+    contexto.set_forkserver_preload([__name__])
+    return contexto
+
+
+@contextmanager
+def _sin_script_principal():
+    # Con forkserver/spawn cada proceso nuevo vuelve a importar el __main__ del padre, que
+    # bajo Streamlit es el script de la app: mientras se lanzan procesos se muestra un
+    # __main__ vacío. Solo se restaura si nadie (otra sesión) lo reemplazó entretanto
+    principal, vacio = sys.modules["__main__"], types.ModuleType("__main__")
+    sys.modules["__main__"] = vacio
+    try:
+        yield
+    finally:
+        if sys.modules["__main__"] is vacio:
+            sys.modules["__main__"] = principal
+
+
+def generar_reportes(inventario, resultados, directorio, procesos=None, tamano_bloque=TAMANO_BLOQUE_REPORTES,
+                     con_mapa=True, con_master=True, al_avanzar=None):
+    """
+    Escribe un PDF por segmento en `directorio` y devuelve la cantidad generada.
+
+    `resultados` es la salida de `evaluar_lote` para `inventario`. Los bloques se
+    generan en un pool de procesos con a lo sumo 2 × procesos bloques en memoria;
+    `al_avanzar(hechos, total)` se llama al terminar cada bloque.
+    """
+    procesos = procesos or procesos_disponibles()
+    os.makedirs(directorio, exist_ok=True)
+    directorio_imagenes = tempfile.mkdtemp(prefix="simef_imagenes_")
+
+    nombres = nombres_archivo(identificadores(inventario))
+
+    total, hechos = len(inventario), 0
+    max_pendientes = 2 * procesos
+    pendientes = deque()
+    try:
+        ruta_master = imagen_master(directorio_imagenes) if con_master else None
+        with ProcessPoolExecutor(max_workers=procesos, mp_context=_contexto_procesos()) as pool:
+            for inicio in range(0, total, tamano_bloque):
+                fin = inicio + tamano_bloque
+                # El pool lanza sus procesos dentro de `submit`
+                with _sin_script_principal():
+                    pendientes.append(pool.submit(
+                        escribir_reportes, inventario.iloc[inicio:fin], resultados.iloc[inicio:fin], nombres[inicio:fin],
+                        directorio, directorio_imagenes, ruta_master, con_mapa,
+                    ))
+                if len(pendientes) >= max_pendientes:
+                    hechos += pendientes.popleft().result()
+                    if al_avanzar:
+                        al_avanzar(hechos, total)
+
+            while pendientes:
+                hechos += pendientes.popleft().result()
+                if al_avanzar:
+                    al_avanzar(hechos, total)
+    finally:
+        shutil.rmtree(directorio_imagenes, ignore_errors=True)
+    return hechos
+
+
+def reportes_zip(inventario, resultados, ruta, procesos=None, con_mapa=True, al_avanzar=None):
+    """
+    Genera los reportes de una campaña y los escribe en el ZIP `ruta`. Los PDF y el ZIP
+    quedan en disco: la memoria no crece con el tamaño de la campaña.
+    """
+    with tempfile.TemporaryDirectory(prefix="simef_reportes_") as directorio:
+        generar_reportes(inventario, resultados, directorio, procesos, con_mapa=con_mapa, al_avanzar=al_avanzar)
+        # Los PDF ya vienen comprimidos: se guardan sin volver a comprimir
+        with zipfile.ZipFile(ruta, "w", zipfile.ZIP_STORED) as zf:
+            for nombre in sorted(os.listdir(directorio)):
+                zf.write(os.path.join(directorio, nombre), nombre)
+    return ruta
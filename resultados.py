@@ -0,0 +1,200 @@
+import numpy as np
+import pandas as pd
+
+from parametros import MOTOR
+
+# ==========================================================================================
+# RESULTADOS COMPACTOS (ARREGLOS DE ANCHO FIJO Y MÁSCARAS DE DRIVERS)
+# ==========================================================================================
+#
+# Por mecanismo se guardan tres arreglos de N elementos: criterios cumplidos (int16),
+# severidad (int8) y una máscara de bits con los drivers activados, donde el bit i es
+# el i-ésimo parámetro del mecanismo en `MOTOR.por_mecanismo[m]`. Un millón de segmentos
+# ocupa unas decenas de MB, frente a los GB de listas y textos de drivers por fila.
+
+# Columna opcional del inventario que identifica cada segmento de tubería
+COLUMNA_ACTIVO = "activo"
+
+TIPO_ACTIVADOS = np.int16
+TIPO_SEVERIDAD = np.int8
+
+
+def tipo_mascara(motor=MOTOR):
+    """Entero sin signo más chico que alcanza para los parámetros de cualquier mecanismo."""
+    maximo = max((len(ps) for ps in motor.por_mecanismo.values()), default=0)
+    if maximo > 64:
+        raise ValueError("Un mecanismo no puede tener más de 64 parámetros")
+    return np.uint32 if maximo <= 32 else np.uint64
+
+
+def codificar_valores(valores, motor=MOTOR):
+    """dict parámetro -> valor como arreglo float64 en el orden de `motor.parametros` (NaN = sin dato)."""
+    fila = np.full(len(motor.parametros), np.nan)
+    for j, p in enumerate(motor.parametros):
+        if p in valores:
+            fila[j] = float(valores[p])
+    return fila
+
+
+def decodificar_valores(fila, motor=MOTOR):
+    """Inversa de `codificar_valores`: vuelve al dict de la Calculadora."""
+    valores = {}
+    for p, x in zip(motor.parametros, fila):
+        if x != x:
+            continue
+        valores[p] = bool(x) if motor.parametros[p]["tipo"] == "bool" else float(x)
+    return valores
+
+
+class ResultadoLote:
+    """
+    Resultados de N segmentos en arreglos por mecanismo (`activados`, `severidad`,
+    `mascaras`). Opcionalmente guarda los identificadores, el índice del inventario
+    y las entradas codificadas (N × parámetros, para casos de la Calculadora).
+    """
+
+    __slots__ = ("activados", "severidad", "mascaras", "activos", "indice", "entradas", "motor")
+
+    def __init__(self, activados, severidad, mascaras, activos=None, indice=None, entradas=None, motor=MOTOR):
+        self.activados = activados
+        self.severidad = severidad
+        self.mascaras = mascaras
+        self.activos = activos
+        self.indice = indice
+        self.entradas = entradas
+        self.motor = motor
+
+    @classmethod
+    def vacio(cls, n, activos=None, indice=None, motor=MOTOR):
+        mascara = tipo_mascara(motor)
+        return cls(
+            {m: np.zeros(n, dtype=TIPO_ACTIVADOS) for m in motor.mecanismos},
+            {m: np.zeros(n, dtype=TIPO_SEVERIDAD) for m in motor.mecanismos},
+            {m: np.zeros(n, dtype=mascara) for m in motor.mecanismos},
+            activos, indice, motor=motor,
+        )
+
+    @classmethod
+    def desde_caso(cls, valores, activados, severidad, drivers, activo=None, motor=MOTOR):
+        """Un caso de `evaluar_valores` como lote de una fila, con sus entradas."""
+        resultado = cls.vacio(1, None if activo is None else np.array([activo], dtype=object), motor=motor)
+        for m in motor.mecanismos:
+            resultado.activados[m][0] = activados[m]
+            resultado.severidad[m][0] = severidad[m]
+            resultado.mascaras[m][0] = resultado.codificar_drivers(m, drivers[m])
+        resultado.entradas = codificar_valores(valores, motor).reshape(1, -1)
+        return resultado
+
+    @classmethod
+    def desde_dataframe(cls, df, motor=MOTOR):
+        """
+        Toma las columnas de `a_dataframe` (o de `evaluar_lote`) sin copiarlas cuando
+        ya tienen el tipo compacto; los drivers en texto se codifican a máscara.
+        """
+        activados, severidad, mascaras = {}, {}, {}
+        tipo = tipo_mascara(motor)
+        for m in motor.mecanismos:
+            activados[m] = df[f"{m}_activados"].to_numpy(dtype=TIPO_ACTIVADOS, copy=False)
+            severidad[m] = df[f"{m}_severidad"].to_numpy(dtype=TIPO_SEVERIDAD, copy=False)
+            if f"{m}_mascara" in df.columns:
+                mascaras[m] = df[f"{m}_mascara"].to_numpy(dtype=tipo, copy=False)
+            else:
+                textos, inversa = np.unique(df[f"{m}_drivers"].fillna("").astype(str).to_numpy(), return_inverse=True)
+                codigos = [cls.codificar_drivers_motor(motor, m, [d for d in t.split(", ") if d]) for t in textos]
+                mascaras[m] = np.array(codigos, dtype=tipo)[inversa]
+        activos = df[COLUMNA_ACTIVO].to_numpy() if COLUMNA_ACTIVO in df.columns else None
+        return cls(activados, severidad, mascaras, activos, df.index, motor=motor)
+
+    # ---------------------------------------------------------
+    # Drivers
+    # ---------------------------------------------------------
+    @staticmethod
+    def codificar_drivers_motor(motor, m, drivers):
+        posiciones = motor.por_mecanismo[m]
+        return sum(1 << posiciones.index(p) for p in drivers)
+
+    def codificar_drivers(self, m, drivers):
+        return self.codificar_drivers_motor(self.motor, m, drivers)
+
+    def nombres_drivers(self, m, mascara):
+        """Parámetros encendidos en una máscara, en el orden de la base de reglas."""
+        mascara = int(mascara)
+        return [p for i, p in enumerate(self.motor.por_mecanismo[m]) if mascara >> i & 1]
+
+    def drivers(self, m):
+        """Drivers de cada segmento como texto 'p1, p2'; se arma un texto por máscara distinta."""
+        unicas, inversa = np.unique(self.mascaras[m], return_inverse=True)
+        textos = np.array([", ".join(self.nombres_drivers(m, u)) for u in unicas], dtype=object)
+        return textos[inversa]
+
+    # ---------------------------------------------------------
+    # Acceso y conversión
+    # ---------------------------------------------------------
+    def __len__(self):
+        return len(next(iter(self.severidad.values()), ()))
+
+    def __iter__(self):
+        return (ResultadoCaso(self, i) for i in range(len(self)))
+
+    def caso(self, i):
+        return ResultadoCaso(self, i)
+
+    @property
+    def nbytes(self):
+        arreglos = [*self.activados.values(), *self.severidad.values(), *self.mascaras.values()]
+        if self.entradas is not None:
+            arreglos.append(self.entradas)
+        return sum(a.nbytes for a in arreglos)
+
+    def a_dataframe(self, drivers=True):
+        """
+        DataFrame con el formato de `evaluar_lote`. Las columnas numéricas comparten
+        memoria con los arreglos; con `drivers=False` se entregan las máscaras
+        (`{m}_mascara`) en lugar de los textos y la conversión no copia nada.
+        """
+        columnas = {}
+        if self.activos is not None:
+            columnas[COLUMNA_ACTIVO] = self.activos
+        for m in self.motor.mecanismos:
+            columnas[f"{m}_activados"] = self.activados[m]
+            columnas[f"{m}_severidad"] = self.severidad[m]
+            if drivers:
+                columnas[f"{m}_drivers"] = self.drivers(m)
+            else:
+                columnas[f"{m}_mascara"] = self.mascaras[m]
+        return pd.DataFrame(columnas, index=self.indice, copy=False)
+
+
+class ResultadoCaso:
+    """Vista de un segmento de un `ResultadoLote`; no copia los arreglos del lote."""
+
+    __slots__ = ("lote", "i")
+
+    def __init__(self, lote, i):
+        self.lote = lote
+        self.i = i
+
+    @property
+    def activo(self):
+        return None if self.lote.activos is None else self.lote.activos[self.i]
+
+    @property
+    def activados(self):
+        return {m: int(a[self.i]) for m, a in self.lote.activados.items()}
+
+    @property
+    def severidad(self):
+        return {m: int(s[self.i]) for m, s in self.lote.severidad.items()}
+
+    @property
+    def drivers(self):
+        return {m: self.lote.nombres_drivers(m, c[self.i]) for m, c in self.lote.mascaras.items()}
+
+    @property
+    def valores(self):
+        if self.lote.entradas is None:
+            return {}
+        return decodificar_valores(self.lote.entradas[self.i], self.lote.motor)
+
+    def __repr__(self):
+        return f"ResultadoCaso(activo={self.activo!r}, severidad={self.severidad})"
@@ -0,0 +1,198 @@
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from evaluacion import COLUMNA_ACTIVO, a_booleano, a_numerico
+from parametros import MOTOR
+
+# ==========================================================================================
+# SENSIBILIDAD: BARRIDOS "QUÉ PASA SI" Y MARGEN A LOS UMBRALES
+# ==========================================================================================
+#
+# Un barrido reemplaza uno o dos parámetros por una rejilla de valores en todos los
+# segmentos. La contribución de los demás parámetros se calcula una sola vez por
+# segmento y la de la rejilla una sola vez por punto; el resultado N × G (o N × G1 × G2)
+# se obtiene por broadcasting de NumPy, sin evaluar celda por celda.
+
+# Celdas (segmentos × puntos de la rejilla) que se procesan juntas al resumir un barrido
+MAX_CELDAS_BLOQUE = 5_000_000
+
+
+@dataclass
+class Barrido:
+    """Severidad y criterios activados por mecanismo para cada segmento y punto de la rejilla."""
+
+    parametros: tuple
+    rejillas: tuple
+    activados: dict
+    severidad: dict
+
+    def severidad_maxima(self):
+        """Peor nivel de cada segmento y punto entre todos los mecanismos."""
+        return np.maximum.reduce(list(self.severidad.values()))
+
+
+def _columna(inventario, p, motor):
+    if motor.parametros[p]["tipo"] == "bool":
+        return a_booleano(inventario[p])
+    return a_numerico(inventario[p])
+
+
+def contribucion_base(inventario, excluir=(), motor=MOTOR):
+    """(activados, severidad) por mecanismo con todos los parámetros salvo `excluir`."""
+    n = len(inventario)
+    activados = {m: np.zeros(n, dtype=np.int16) for m in motor.mecanismos}
+    severidad = {m: np.zeros(n, dtype=np.int8) for m in motor.mecanismos}
+    for p, info in motor.parametros.items():
+        if p in excluir or p not in inventario.columns:
+            continue
+        cumplidas, nivel = motor.clasificar_arreglo(p, _columna(inventario, p, motor))
+        m = info["mecanismo"]
+        activados[m] += cumplidas.astype(np.int16)
+        np.maximum(severidad[m], nivel.astype(np.int8), out=severidad[m])
+    return activados, severidad
+
+
+def barrido(inventario, rejillas, motor=MOTOR):
+    """
+    Evalúa el inventario reemplazando los parámetros de `rejillas` (dict parámetro ->
+    valores, uno o dos parámetros) por cada punto de su rejilla.
+
+    Las matrices de resultado tienen forma (N, G1) o (N, G1, G2).
+    """
+    if not 1 <= len(rejillas) <= 2:
+        raise ValueError("El barrido admite uno o dos parámetros")
+    parametros = tuple(rejillas)
+    base_activados, base_severidad = contribucion_base(inventario, parametros, motor)
+    dimensiones = len(parametros)
+
+    activados = {m: base_activados[m].reshape((-1,) + (1,) * dimensiones) for m in motor.mecanismos}
+    severidad = {m: base_severidad[m].reshape((-1,) + (1,) * dimensiones) for m in motor.mecanismos}
+
+    for eje, p in enumerate(parametros):
+        # La rejilla se clasifica una vez; cada eje se expande sobre su propia dimensión
+        cumplidas, nivel = motor.clasificar_arreglo(p, np.asarray(rejillas[p], dtype=float))
+        forma = [1] * (dimensiones + 1)
+        forma[eje + 1] = -1
+        m = motor.parametros[p]["mecanismo"]
+        activados[m] = activados[m] + cumplidas.astype(np.int16).reshape(forma)
+        severidad[m] = np.maximum(severidad[m], nivel.astype(np.int8).reshape(forma))
+
+    forma = (len(inventario),) + tuple(len(rejillas[p]) for p in parametros)
+    return Barrido(
+        parametros=parametros,
+        rejillas=tuple(np.asarray(rejillas[p], dtype=float) for p in parametros),
+        activados={m: np.broadcast_to(a, forma) for m, a in activados.items()},
+        severidad={m: np.broadcast_to(s, forma) for m, s in severidad.items()},
+    )
+
+
+def proporcion_niveles(inventario, rejillas, mecanismo=None, motor=MOTOR):
+    """
+    Fracción de segmentos en Normal/Alerta/Severo para cada punto de la rejilla.
+
+    Con `mecanismo=None` se usa el peor nivel del segmento entre todos los mecanismos.
+    Devuelve un arreglo (3, G1) o (3, G1, G2); el inventario se recorre por bloques para
+    no materializar más de `MAX_CELDAS_BLOQUE` celdas a la vez.
+    """
+    puntos = int(np.prod([len(v) for v in rejillas.values()]))
+    tamano_bloque = max(1, MAX_CELDAS_BLOQUE // puntos)
+    conteos = np.zeros((3,) + tuple(len(v) for v in rejillas.values()), dtype=np.int64)
+
+    for inicio in range(0, len(inventario), tamano_bloque):
+        resultado = barrido(inventario.iloc[inicio:inicio + tamano_bloque], rejillas, motor)
+        niveles = resultado.severidad_maxima() if mecanismo is None else resultado.severidad[mecanismo]
+        for nivel in range(3):
+            conteos[nivel] += (niveles == nivel).sum(axis=0)
+
+    return conteos / max(len(inventario), 1)
+
+
+def rejilla_sugerida(parametro, puntos=50, motor=MOTOR):
+    """Rango de valores alrededor de los umbrales del parámetro."""
+    umbrales = [float(r.umbral) for r in motor.parametros[parametro]["reglas"]]
+    bajo, alto = min(umbrales), max(umbrales)
+    ancho = max(alto - bajo, abs(alto), 1.0)
+    return np.linspace(bajo - 0.5 * ancho, alto + 0.5 * ancho, puntos)
+
+
+# ==========================================================================================
+# MARGEN A LOS UMBRALES
+# ==========================================================================================
+
+def _margenes(inventario, parametros, motor):
+    # Por parámetro numérico presente: (valores, umbral, nivel, distancia, distancia relativa)
+    for p in parametros:
+        if p not in inventario.columns or motor.parametros[p]["tipo"] != "num":
+            continue
+        valores = a_numerico(inventario[p])
+        umbral, nivel, distancia = motor.margen_arreglo(p, valores)
+        # Relativa al umbral; con umbral 0 se expresa en unidades del parámetro
+        escala = np.where(umbral != 0, np.abs(umbral), 1.0)
+        yield p, valores, umbral, nivel, distancia, distancia / escala
+
+
+def _mejores(relativo, k):
+    # Los k índices de menor margen, ordenados (selección parcial + orden de solo k)
+    finitos = np.flatnonzero(np.isfinite(relativo))
+    if len(finitos) > k:
+        finitos = finitos[np.argpartition(relativo[finitos], k - 1)[:k]]
+    return finitos[np.argsort(relativo[finitos], kind="stable")]
+
+
+def ranking_margenes(inventario, k=20, por_segmento=True, mecanismo=None, motor=MOTOR):
+    """
+    Los `k` casos más cercanos a cruzar al siguiente nivel (Alerta o Severo).
+
+    Con `por_segmento=True` cada segmento aparece una vez, con su parámetro más cercano
+    a un umbral; con `False` se ordenan los pares segmento-parámetro (útil para un caso
+    único). Solo se consideran parámetros numéricos; los que ya están en su nivel
+    máximo o sin dato quedan fuera.
+    """
+    parametros = motor.por_mecanismo[mecanismo] if mecanismo else list(motor.parametros)
+    if COLUMNA_ACTIVO in inventario.columns:
+        ids = inventario[COLUMNA_ACTIVO].to_numpy()
+    else:
+        ids = inventario.index.to_numpy()
+
+    candidatos = []
+    if por_segmento:
+        # Mínimo acumulado por segmento: memoria O(N) sin importar la cantidad de parámetros
+        mejor = np.full(len(inventario), np.inf)
+        cual = np.full(len(inventario), -1, dtype=np.int16)
+        nombres = []
+        for j, (p, *_, relativo) in enumerate(_margenes(inventario, parametros, motor)):
+            menor = relativo < mejor
+            mejor[menor] = relativo[menor]
+            cual[menor] = j
+            nombres.append(p)
+        # Los detalles solo se recalculan para los k elegidos
+        for i in _mejores(mejor, k):
+            p = nombres[cual[i]]
+            valor = a_numerico(inventario[p].iloc[[i]])
+            umbral, nivel, distancia = motor.margen_arreglo(p, valor)
+            candidatos.append((mejor[i], i, p, valor[0], umbral[0], nivel[0], distancia[0]))
+    else:
+        for p, valores, umbral, nivel, distancia, relativo in _margenes(inventario, parametros, motor):
+            for i in _mejores(relativo, k):
+                candidatos.append((relativo[i], i, p, valores[i], umbral[i], nivel[i], distancia[i]))
+        candidatos.sort(key=lambda c: c[0])
+        candidatos = candidatos[:k]
+
+    return pd.DataFrame(
+        [
+            {
+                COLUMNA_ACTIVO: ids[i],
+                "mecanismo": motor.parametros[p]["mecanismo"],
+                "parametro": p,
+                "valor": valor,
+                "umbral": umbral,
+                "nivel_siguiente": int(nivel),
+                "margen": distancia,
+                "margen_relativo": relativo,
+            }
+            for relativo, i, p, valor, umbral, nivel, distancia in candidatos
+        ],
+        columns=[COLUMNA_ACTIVO, "mecanismo", "parametro", "valor", "umbral", "nivel_siguiente", "margen", "margen_relativo"],
+    )
@@ -0,0 +1,402 @@
+import argparse
+import asyncio
+import csv
+import json
+import os
+import random
+import threading
+import time
+from collections import deque
+
+from evaluacion import COLUMNA_ACTIVO, VALORES_VERDADEROS
+from parametros import MECANISMOS, MOTOR
+from rendimiento import METRICAS
+
+# ==========================================================================================
+# INGESTA EN LÍNEA DE SENSORES (VENTANAS MÓVILES Y EVALUACIÓN INCREMENTAL)
+# ==========================================================================================
+#
+# Las lecturas llegan como líneas JSON o CSV desde un archivo que se va escribiendo
+# (tail) o desde un socket local. Cada línea puede traer una lectura
+#
+#   {"activo": "L-101", "parametro": "pco2", "valor": 0.8}
+#
+# o varias en formato ancho ({"activo": "L-101", "ph": 5.4, "pco2": 0.8}). Por activo y
+# parámetro se conserva una ventana de las últimas lecturas; el valor evaluado es la
+# media de la ventana (la última lectura para los booleanos). Solo se reevalúan los
+# mecanismos cuyos parámetros recibieron lecturas.
+
+# Lecturas que se conservan por activo y parámetro
+TAMANO_VENTANA = 10
+
+# Lecturas que se procesan juntas como máximo antes de publicar el estado
+MAX_LECTURAS_POR_CICLO = 5_000
+
+# Segundos entre consultas al archivo cuando no hay líneas nuevas
+INTERVALO_ARCHIVO = 0.2
+
+CAMPOS_LECTURA = {COLUMNA_ACTIVO, "parametro", "valor", "fecha"}
+
+
+def convertir_valor(parametro, valor):
+    """Valor de una lectura en el tipo del parámetro; None si no se puede interpretar."""
+    if MOTOR.parametros[parametro]["tipo"] == "bool":
+        if isinstance(valor, bool):
+            return valor
+        return str(valor).strip().lower() in VALORES_VERDADEROS
+    try:
+        x = float(valor)
+    except (TypeError, ValueError):
+        return None
+    return None if x != x else x
+
+
+def interpretar_linea(linea, encabezado=None):
+    """Lecturas (activo, parámetro, valor) de una línea JSON o CSV (con su encabezado)."""
+    linea = linea.strip()
+    if not linea:
+        return []
+    if linea.startswith("{"):
+        try:
+            registro = json.loads(linea)
+        except json.JSONDecodeError:
+            return []
+    elif encabezado:
+        registro = dict(zip(encabezado, next(csv.reader([linea]))))
+    else:
+        return []
+
+    activo = registro.get(COLUMNA_ACTIVO)
+    if activo in (None, ""):
+        return []
+    if "parametro" in registro:
+        pares = [(registro["parametro"], registro.get("valor"))]
+    else:
+        pares = [(p, v) for p, v in registro.items() if p not in CAMPOS_LECTURA]
+
+    lecturas = []
+    for p, v in pares:
+        if p not in MOTOR.parametros or v in (None, ""):
+            continue
+        valor = convertir_valor(p, v)
+        if valor is not None:
+            lecturas.append((str(activo), p, valor))
+    return lecturas
+
+
+class EstadoActivo:
+    """Ventanas y resultado vigente de un activo."""
+
+    __slots__ = ("ventanas", "valores", "activados", "severidad", "drivers", "actualizado")
+
+    def __init__(self):
+        self.ventanas = {}
+        self.valores = {}
+        self.activados = {m: 0 for m in MECANISMOS}
+        self.severidad = {m: 0 for m in MECANISMOS}
+        self.drivers = {m: [] for m in MECANISMOS}
+        self.actualizado = 0.0
+
+    def agregar(self, parametro, valor, tamano_ventana):
+        ventana = self.ventanas.get(parametro)
+        if ventana is None:
+            ventana = self.ventanas[parametro] = deque(maxlen=tamano_ventana)
+        ventana.append(valor)
+
+    def recalcular_valor(self, parametro):
+        ventana = self.ventanas[parametro]
+        if MOTOR.parametros[parametro]["tipo"] == "bool":
+            self.valores[parametro] = ventana[-1]
+        else:
+            self.valores[parametro] = sum(ventana) / len(ventana)
+
+    def evaluar_mecanismo(self, m):
+        """Reevalúa un mecanismo con los valores vigentes; devuelve True si cambió su severidad."""
+        activados, severidad, drivers = 0, 0, []
+        for p in MOTOR.por_mecanismo[m]:
+            if p not in self.valores:
+                continue
+            cumplidas, nivel = MOTOR.clasificar(p, self.valores[p])
+            if cumplidas:
+                activados += cumplidas
+                severidad = max(severidad, nivel)
+                drivers.append(p)
+        cambio = severidad != self.severidad[m]
+        self.activados[m], self.severidad[m], self.drivers[m] = activados, severidad, drivers
+        return cambio
+
+
+class MonitorStreaming:
+    """
+    Consume lecturas en un event loop de asyncio que corre en un hilo propio y mantiene
+    el estado por activo. La interfaz solo lee instantáneas (`tabla`, `estadisticas`).
+    """
+
+    def __init__(self, tamano_ventana=TAMANO_VENTANA):
+        self.tamano_ventana = tamano_ventana
+        self.activos = {}
+        self.lecturas = 0
+        self.evaluaciones = 0
+        self.cambios_severidad = 0
+        self.version = 0
+        self.origen = None
+        self.error = None
+        self._inicio = None
+        self._lock = threading.Lock()
+        self._hilo = None
+        self._loop = None
+        self._detener = None
+
+    # ---------------------------------------------------------
+    # Evaluación incremental
+    # ---------------------------------------------------------
+    def aplicar(self, lecturas):
+        """Incorpora un grupo de lecturas y reevalúa solo los mecanismos afectados."""
+        inicio = time.perf_counter()
+        afectados = {}
+        with self._lock:
+            for activo, p, valor in lecturas:
+                estado = self.activos.get(activo)
+                if estado is None:
+                    estado = self.activos[activo] = EstadoActivo()
+                estado.agregar(p, valor, self.tamano_ventana)
+                afectados.setdefault(activo, set()).add(p)
+
+            ahora = time.time()
+            for activo, parametros in afectados.items():
+                estado = self.activos[activo]
+                for p in parametros:
+                    estado.recalcular_valor(p)
+                for m in {MOTOR.parametros[p]["mecanismo"] for p in parametros}:
+                    self.cambios_severidad += estado.evaluar_mecanismo(m)
+                    self.evaluaciones += 1
+                estado.actualizado = ahora
+
+            self.lecturas += len(lecturas)
+            self.version += 1
+        METRICAS.registrar("streaming.evaluacion", (time.perf_counter() - inicio) * 1000)
+
+    async def _consumir(self, cola):
+        while True:
+            lecturas = await cola.get()
+            # Se agrupan las lecturas acumuladas para publicar una sola versión del estado
+            while not cola.empty() and len(lecturas) < MAX_LECTURAS_POR_CICLO:
+                lecturas.extend(cola.get_nowait())
+            self.aplicar(lecturas)
+
+    # ---------------------------------------------------------
+    # Fuentes
+    # ---------------------------------------------------------
+    async def _leer_archivo(self, ruta, cola, desde_inicio):
+        while not os.path.exists(ruta):
+            await asyncio.sleep(INTERVALO_ARCHIVO)
+
+        es_csv = not ruta.lower().endswith(".jsonl")
+        with open(ruta, encoding="utf-8", newline="") as f:
+            encabezado = None
+            if not desde_inicio:
+                primera = f.readline()
+                if es_csv and primera.endswith("\n"):
+                    encabezado = next(csv.reader([primera.strip()]), None)
+                if not es_csv or encabezado:
+                    f.seek(0, os.SEEK_END)
+                else:
+                    # Encabezado todavía incompleto: se lee desde el principio
+                    f.seek(0)
+
+            pendiente = ""
+            while True:
+                bloque = f.read(1 << 16)
+                if not bloque:
+                    await asyncio.sleep(INTERVALO_ARCHIVO)
+                    continue
+                # Una línea sin salto final todavía se está escribiendo
+                *lineas, pendiente = (pendiente + bloque).split("\n")
+                # El encabezado CSV es la primera línea completa (el archivo puede estar vacío al abrirlo)
+                while es_csv and not encabezado and lineas:
+                    encabezado = next(csv.reader([lineas.pop(0).strip()]), None)
+                lecturas = [l for linea in lineas for l in interpretar_linea(linea, encabezado)]
+                if lecturas:
+                    await cola.put(lecturas)
+
+    async def _servir_socket(self, host, puerto, cola):
+        clientes = {}
+
+        async def atender(lector, escritor):
+            clientes[asyncio.current_task()] = escritor
+            encabezado = None
+            try:
+                async for linea in lector:
+                    texto = linea.decode("utf-8", errors="replace")
+                    if encabezado is None and not texto.lstrip().startswith("{") and COLUMNA_ACTIVO in texto:
+                        encabezado = next(csv.reader([texto.strip()]))
+                        continue
+                    lecturas = interpretar_linea(texto, encabezado)
+                    if lecturas:
+                        await cola.put(lecturas)
+            finally:
+                clientes.pop(asyncio.current_task(), None)
+                escritor.close()
+                try:
+                    await escritor.wait_closed()
+                except ConnectionError:
+                    pass
+
+        servidor = await asyncio.start_server(atender, host, puerto)
+        try:
+            async with servidor:
+                await servidor.serve_forever()
+        finally:
+            # Al detener el monitor se cierran también las conexiones abiertas: cada `atender`
+            # ve el fin de la conexión y termina solo (cancelarlo deja errores en asyncio 3.11)
+            pendientes = list(clientes.items())
+            for _, escritor in pendientes:
+                escritor.close()
+            await asyncio.gather(*(tarea for tarea, _ in pendientes), return_exceptions=True)
+
+    async def _ejecutar(self, fuente, detener):
+        cola = asyncio.Queue(maxsize=1_000)
+        tareas = [asyncio.create_task(self._consumir(cola)), asyncio.create_task(fuente(cola))]
+        espera_detener = asyncio.create_task(detener.wait())
+        hechas, _ = await asyncio.wait([*tareas, espera_detener], return_when=asyncio.FIRST_COMPLETED)
+        for tarea in [*tareas, espera_detener]:
+            tarea.cancel()
+        # Las tareas canceladas cierran su archivo o servidor antes de que se cierre el loop
+        await asyncio.gather(*tareas, espera_detener, return_exceptions=True)
+        for tarea in hechas:
+            if tarea is not espera_detener and not tarea.cancelled() and tarea.exception():
+                raise tarea.exception()
+
+    def _hilo_principal(self, loop, detener, fuente):
+        try:
+            loop.run_until_complete(self._ejecutar(fuente, detener))
+        except Exception as e:
+            self.error = f"{type(e).__name__}: {e}"
+        finally:
+            loop.close()
+
+    # ---------------------------------------------------------
+    # Control
+    # ---------------------------------------------------------
+    @property
+    def activo(self):
+        return self._hilo is not None and self._hilo.is_alive()
+
+    def iniciar_archivo(self, ruta, desde_inicio=True):
+        self._iniciar(lambda cola: self._leer_archivo(ruta, cola, desde_inicio), f"archivo:{ruta}")
+
+    def iniciar_socket(self, puerto, host="127.0.0.1"):
+        self._iniciar(lambda cola: self._servir_socket(host, puerto, cola), f"socket:{host}:{puerto}")
+
+    def _iniciar(self, fuente, origen):
+        self.detener()
+        self.origen, self.error = origen, None
+        self._inicio = time.time()
+        # El loop y la señal de parada existen antes de arrancar el hilo: `detener` puede
+        # llamarse en cualquier momento y la señal queda encolada hasta que el loop corra
+        self._loop = asyncio.new_event_loop()
+        self._detener = asyncio.Event()
+        self._hilo = threading.Thread(
+            target=self._hilo_principal, args=(self._loop, self._detener, fuente), daemon=True, name="simef-streaming"
+        )
+        self._hilo.start()
+
+    def detener(self):
+        if self._loop is not None:
+            try:
+                self._loop.call_soon_threadsafe(self._detener.set)
+            except RuntimeError:
+                pass  # el hilo ya terminó y cerró el loop
+        if self._hilo is not None:
+            self._hilo.join(timeout=5)
+        self._hilo = self._loop = self._detener = None
+
+    def reiniciar(self):
+        with self._lock:
+            self.activos.clear()
+            self.lecturas = self.evaluaciones = self.cambios_severidad = 0
+            self.version += 1
+        self._inicio = time.time() if self.activo else None
+
+    # ---------------------------------------------------------
+    # Instantáneas para la interfaz
+    # ---------------------------------------------------------
+    def estadisticas(self):
+        with self._lock:
+            transcurrido = time.time() - self._inicio if self._inicio else 0.0
+            return {
+                "activos": len(self.activos),
+                "lecturas": self.lecturas,
+                "evaluaciones": self.evaluaciones,
+                "cambios_severidad": self.cambios_severidad,
+                "lecturas_s": self.lecturas / transcurrido if transcurrido > 0 else 0.0,
+                "version": self.version,
+            }
+
+    def tabla(self, severidad_min=0, limite=500):
+        """Activos en el formato de `evaluar_lote`, ordenados por severidad y actualización."""
+        import pandas as pd
+
+        with self._lock:
+            filas = []
+            for activo, estado in self.activos.items():
+                maxima = max(estado.severidad.values())
+                if maxima < severidad_min:
+                    continue
+                fila = {COLUMNA_ACTIVO: activo, "severidad_max": maxima, "actualizado": estado.actualizado}
+                for m in MECANISMOS:
+                    fila[f"{m}_activados"] = estado.activados[m]
+                    fila[f"{m}_severidad"] = estado.severidad[m]
+                    fila[f"{m}_drivers"] = ", ".join(estado.drivers[m])
+                filas.append(fila)
+
+        tabla = pd.DataFrame(filas, columns=[COLUMNA_ACTIVO, "severidad_max", "actualizado"] + [
+            f"{m}_{c}" for m in MECANISMOS for c in ("activados", "severidad", "drivers")
+        ])
+        tabla = tabla.sort_values(["severidad_max", "actualizado"], ascending=False).head(limite)
+        tabla["actualizado"] = pd.to_datetime(tabla["actualizado"], unit="s")
+        return tabla.reset_index(drop=True)
+
+    def valores(self, activo):
+        """Valores vigentes (media de la ventana) de un activo, como en la Calculadora."""
+        with self._lock:
+            estado = self.activos.get(activo)
+            return dict(estado.valores) if estado else {}
+
+
+# ==========================================================================================
+# EMISOR DE LECTURAS DE PRUEBA
+# ==========================================================================================
+#
+#   python streaming.py lecturas.jsonl --activos 2000 --tasa 5000
+#
+# Agrega lecturas aleatorias al archivo, alrededor del primer umbral de cada parámetro
+# numérico, para probar la vista "Monitoreo en Línea".
+
+def emitir(ruta, activos, tasa, duracion=None, semilla=0):
+    rng = random.Random(semilla)
+    numericos = [p for p, info in MOTOR.parametros.items() if info["tipo"] == "num"]
+    inicio = time.perf_counter()
+    with open(ruta, "a", encoding="utf-8") as f:
+        while duracion is None or time.perf_counter() - inicio < duracion:
+            ciclo = time.perf_counter()
+            for _ in range(max(1, tasa // 10)):
+                p = rng.choice(numericos)
+                umbral = float(MOTOR.parametros[p]["reglas"][0].umbral)
+                f.write(json.dumps({
+                    COLUMNA_ACTIVO: f"L{rng.randrange(activos)}",
+                    "parametro": p,
+                    "valor": round(rng.gauss(umbral, abs(umbral) * 0.5 + 1), 4),
+                }) + "\n")
+            f.flush()
+            time.sleep(max(0.0, 0.1 - (time.perf_counter() - ciclo)))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Escribe lecturas de sensores de prueba en un archivo JSONL.")
+    parser.add_argument("ruta", help="Archivo JSONL de destino (se agregan líneas)")
+    parser.add_argument("--activos", type=int, default=1_000, help="Cantidad de activos distintos")
+    parser.add_argument("--tasa", type=int, default=1_000, help="Lecturas por segundo")
+    parser.add_argument("--duracion", type=float, help="Segundos de emisión (por defecto, sin límite)")
+    args = parser.parse_args()
+    emitir(args.ruta, args.activos, args.tasa, args.duracion)
@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.sintetico import inventario_sintetico
+from evaluacion import VALORES_VERDADEROS, evaluar_lote, evaluar_lote_compacto, evaluar_valores
+from parametros import MECANISMOS, MOTOR
+
+# ==========================================================================================
+# EQUIVALENCIA ENTRE LA EVALUACIÓN POR LOTE Y LA LÓGICA POR FILA DE LA CALCULADORA
+# ==========================================================================================
+
+N = 3000
+
+# Valores sobre, entre y a ambos lados de los dos umbrales (y celdas vacías)
+DOS_UMBRALES = {
+    "pco2": [0.0, 0.29, 0.3, 0.5, 0.99, 1.0, 1.5, np.nan],
+    "corrosion_rate": [0.0, 0.0999, 0.1, 0.2, 0.3, 0.31, np.nan],
+}
+
+# Booleanos como llegan de una planilla: textos, vacíos y nulos
+TEXTOS_BOOLEANOS = ["TRUE", "false", "Sí", "no", "1", "0", "", "  ", None, np.nan]
+
+
+def _inventario(semilla=0):
+    rng = np.random.default_rng(semilla)
+    inventario = inventario_sintetico(N, semilla=semilla, fraccion_vacios=0.2)
+    for p, valores in DOS_UMBRALES.items():
+        inventario[p] = rng.choice(np.array(valores, dtype=float), N)
+    booleanos = [p for p, info in MOTOR.parametros.items() if info["tipo"] == "bool"]
+    for p in booleanos[::2]:
+        inventario[p] = pd.Series(rng.choice(np.array(TEXTOS_BOOLEANOS, dtype=object), N), dtype=object)
+    return inventario
+
+
+def _valores_calculadora(fila):
+    # Lo que el usuario ingresaría en la Calculadora: sin las celdas vacías
+    valores = {}
+    for p, info in MOTOR.parametros.items():
+        v = fila[p]
+        if v is None or v != v or (isinstance(v, str) and not v.strip()):
+            continue
+        if info["tipo"] == "bool":
+            valores[p] = v if isinstance(v, (bool, np.bool_)) else str(v).strip().lower() in VALORES_VERDADEROS
+        else:
+            valores[p] = float(v)
+    return valores
+
+
+@pytest.mark.parametrize("semilla", [0, 1])
+def test_evaluar_lote_igual_a_evaluar_valores(semilla):
+    inventario = _inventario(semilla)
+    resultados = evaluar_lote(inventario)
+
+    for i, fila in enumerate(inventario.to_dict("records")):
+        activados, severidad, drivers = evaluar_valores(_valores_calculadora(fila))
+        for m in MECANISMOS:
+            assert resultados[f"{m}_activados"].iat[i] == activados[m], (i, m)
+            assert resultados[f"{m}_severidad"].iat[i] == severidad[m], (i, m)
+            assert resultados[f"{m}_drivers"].iat[i] == ", ".join(drivers[m]), (i, m)
+
+
+def test_dos_umbrales_cubren_los_tres_niveles():
+    inventario = _inventario()
+    for p in DOS_UMBRALES:
+        _, nivel = MOTOR.clasificar_arreglo(p, inventario[p].to_numpy(dtype=float))
+        assert set(np.unique(nivel)) == {0, 1, 2}, p
+
+
+def test_resultado_compacto_sin_drivers_en_texto():
+    inventario = _inventario()
+    compacto = evaluar_lote_compacto(inventario)
+    resultados = evaluar_lote(inventario)
+    for i in range(0, N, 97):
+        caso = compacto.caso(i)
+        for m in MECANISMOS:
+            assert caso.drivers[m] == [d for d in resultados[f"{m}_drivers"].iat[i].split(", ") if d]